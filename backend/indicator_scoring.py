@@ -6,9 +6,14 @@ Converts raw Excel data into numeric scores for each official methodology indica
 Uses a simpler, more robust approach that doesn't depend on exact column names.
 """
 
+import numpy as np
 import pandas as pd
 import logging
-from typing import Optional
+from functools import lru_cache
+from typing import Iterable, Mapping, Optional, Union
+
+# A sheet row: pd.Series or a plain {column: value} dict (e.g. from df.to_dict('records'))
+Row = Union[pd.Series, Mapping]
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +22,9 @@ class IndicatorScorer:
     """Calculates indicator scores based on official methodology rules."""
 
     @staticmethod
-    def _get_data_columns(row: pd.Series) -> list:
-        """Get non-header columns (skip Муниципалитет, Глава МО, etc.)"""
+    @lru_cache(maxsize=1024)
+    def _is_metadata_column(col) -> bool:
+        """True for header-only columns (Муниципалитет, Глава МО, etc.); cached per column name"""
         # Skip columns that are metadata/headers only
         # Use word boundaries or exact matches for more precision
         skip_patterns = [
@@ -31,27 +37,30 @@ class IndicatorScorer:
             'index'             # index columns
         ]
 
-        data_cols = []
-        for col in row.index:
-            col_str = str(col).strip().lower()
-
-            # Check for exact matches or word-boundary matches
-            skip = False
-            for pattern in skip_patterns:
-                # For short patterns like 'мо', require word boundaries
-                if pattern in ['мо']:
-                    # Check if it's a whole word
-                    import re
-                    if re.search(r'\b' + re.escape(pattern) + r'\b', col_str):
-                        skip = True
-                        break
-                else:
-                    # For longer patterns, substring match is OK
-                    if pattern in col_str:
-                        skip = True
-                        break
+        col_str = str(col).strip().lower()
 
-            if skip:
+        # Check for exact matches or word-boundary matches
+        for pattern in skip_patterns:
+            # For short patterns like 'мо', require word boundaries
+            if pattern in ['мо']:
+                # Check if it's a whole word
+                import re
+                if re.search(r'\b' + re.escape(pattern) + r'\b', col_str):
+                    return True
+            else:
+                # For longer patterns, substring match is OK
+                if pattern in col_str:
+                    return True
+
+        return False
+
+    @staticmethod
+    def _get_data_columns(row: Row) -> list:
+        """Get non-header columns (skip Муниципалитет, Глава МО, etc.)"""
+        data_cols = []
+        for col in row.keys():
+            # Every row of a sheet shares the header, so the name check is cached
+            if IndicatorScorer._is_metadata_column(col):
                 continue
 
             # Skip NaN columns
@@ -63,7 +72,7 @@ class IndicatorScorer:
         return data_cols
 
     @staticmethod
-    def _count_yes_values(row: pd.Series, limit: int = None) -> int:
+    def _count_yes_values(row: Row, limit: int = None) -> int:
         """Count "Да" values in numeric columns, up to limit"""
         data_cols = IndicatorScorer._get_data_columns(row)
         count = 0
@@ -81,7 +90,7 @@ class IndicatorScorer:
         return count
 
     @staticmethod
-    def _get_numeric_values(row: pd.Series) -> list:
+    def _get_numeric_values(row: Row) -> list:
         """Get all numeric values from data columns"""
         data_cols = IndicatorScorer._get_data_columns(row)
         values = []
@@ -99,7 +108,7 @@ class IndicatorScorer:
         return values
 
     @staticmethod
-    def _get_first_text_value(row: pd.Series) -> Optional[str]:
+    def _get_first_text_value(row: Row) -> Optional[str]:
         """Get first text (non-numeric) value from data columns"""
         data_cols = IndicatorScorer._get_data_columns(row)
 
@@ -120,7 +129,7 @@ class IndicatorScorer:
     # ============ PUBLIC INDICATORS (pub_1 to pub_9) ============
 
     @staticmethod
-    def score_pub_1(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_pub_1(row: Row, col_mapping: dict = None) -> Optional[float]:
         """pub_1: Support (3 yes/no questions) -> 0-3"""
         count = IndicatorScorer._count_yes_values(row, limit=3)
         if count == 0:
@@ -130,7 +139,7 @@ class IndicatorScorer:
         return float(count)
 
     @staticmethod
-    def score_pub_2(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_pub_2(row: Row, col_mapping: dict = None) -> Optional[float]:
         """pub_2: Task execution (numeric %) -> 0-5 (max)"""
         values = IndicatorScorer._get_numeric_values(row)
         if not values:
@@ -160,7 +169,7 @@ class IndicatorScorer:
         return score
 
     @staticmethod
-    def score_pub_3(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_pub_3(row: Row, col_mapping: dict = None) -> Optional[float]:
         """pub_3: Head positioning (categorical) -> 0-3"""
         text = IndicatorScorer._get_first_text_value(row)
         if not text:
@@ -176,7 +185,7 @@ class IndicatorScorer:
         return None
 
     @staticmethod
-    def score_pub_4(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_pub_4(row: Row, col_mapping: dict = None) -> Optional[float]:
         """pub_4: Project activity (numeric) -> 0-3"""
         values = IndicatorScorer._get_numeric_values(row)
         if not values:
@@ -188,7 +197,7 @@ class IndicatorScorer:
         return score
 
     @staticmethod
-    def score_pub_5(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_pub_5(row: Row, col_mapping: dict = None) -> Optional[float]:
         """pub_5: Youth volunteering (numeric %) -> 0-3"""
         values = IndicatorScorer._get_numeric_values(row)
         if not values:
@@ -213,7 +222,7 @@ class IndicatorScorer:
         return score
 
     @staticmethod
-    def score_pub_6(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_pub_6(row: Row, col_mapping: dict = None) -> Optional[float]:
         """pub_6: Youth in First Movement (numeric %) -> 0-3"""
         values = IndicatorScorer._get_numeric_values(row)
         if not values:
@@ -238,7 +247,7 @@ class IndicatorScorer:
         return score
 
     @staticmethod
-    def score_pub_7(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_pub_7(row: Row, col_mapping: dict = None) -> Optional[float]:
         """pub_7: Veterans work (3 metrics: count, %, %) -> 0-3"""
         values = IndicatorScorer._get_numeric_values(row)
         if len(values) < 3:
@@ -265,7 +274,7 @@ class IndicatorScorer:
         return score
 
     @staticmethod
-    def score_pub_8(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_pub_8(row: Row, col_mapping: dict = None) -> Optional[float]:
         """pub_8: Cadre reserve (numeric %) -> 0-3"""
         values = IndicatorScorer._get_numeric_values(row)
         if not values:
@@ -290,7 +299,7 @@ class IndicatorScorer:
         return score
 
     @staticmethod
-    def score_pub_9(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_pub_9(row: Row, col_mapping: dict = None) -> Optional[float]:
         """pub_9: Grants work (wins + volume + violations) -> 0-3"""
         values = IndicatorScorer._get_numeric_values(row)
         data_cols = IndicatorScorer._get_data_columns(row)
@@ -340,7 +349,7 @@ class IndicatorScorer:
     # ============ CLOSED INDICATORS (closed_1 to closed_8) ============
 
     @staticmethod
-    def score_closed_1(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_closed_1(row: Row, col_mapping: dict = None) -> Optional[float]:
         """closed_1: Party opinion (% members + % supporters) -> 0-6"""
         values = IndicatorScorer._get_numeric_values(row)
         if len(values) < 2:
@@ -362,7 +371,7 @@ class IndicatorScorer:
         return score
 
     @staticmethod
-    def score_closed_2(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_closed_2(row: Row, col_mapping: dict = None) -> Optional[float]:
         """closed_2: Alternative mandates (numeric %) -> 0-4"""
         values = IndicatorScorer._get_numeric_values(row)
         if not values:
@@ -385,7 +394,7 @@ class IndicatorScorer:
         return score
 
     @staticmethod
-    def score_closed_3(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_closed_3(row: Row, col_mapping: dict = None) -> Optional[float]:
         """closed_3: AGP targets (level) -> 0-5"""
         text = IndicatorScorer._get_first_text_value(row)
         if not text:
@@ -402,7 +411,7 @@ class IndicatorScorer:
             return 0.0
 
     @staticmethod
-    def score_closed_4(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_closed_4(row: Row, col_mapping: dict = None) -> Optional[float]:
         """closed_4: AGP targets (quality) -> 0-5"""
         text = IndicatorScorer._get_first_text_value(row)
         if not text:
@@ -419,7 +428,7 @@ class IndicatorScorer:
             return 0.0
 
     @staticmethod
-    def score_closed_5(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_closed_5(row: Row, col_mapping: dict = None) -> Optional[float]:
         """closed_5: Economic attractiveness -> 0-3"""
         text = IndicatorScorer._get_first_text_value(row)
         if not text:
@@ -438,7 +447,7 @@ class IndicatorScorer:
         return None
 
     @staticmethod
-    def score_closed_7(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_closed_7(row: Row, col_mapping: dict = None) -> Optional[float]:
         """closed_7: Veterans political activity (% members + % supporters) -> 0-6"""
         values = IndicatorScorer._get_numeric_values(row)
         if len(values) < 2:
@@ -459,7 +468,7 @@ class IndicatorScorer:
         return score
 
     @staticmethod
-    def score_closed_8(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_closed_8(row: Row, col_mapping: dict = None) -> Optional[float]:
         """closed_8: Pride project (count or yes/no) -> 0-2"""
         values = IndicatorScorer._get_numeric_values(row)
 
@@ -492,7 +501,7 @@ class IndicatorScorer:
     # ============ PENALTY INDICATORS (pen_1 to pen_3) ============
 
     @staticmethod
-    def score_pen_1(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_pen_1(row: Row, col_mapping: dict = None) -> Optional[float]:
         """pen_1: Regional conflicts (2 yes/no) -> -3 to +2"""
         data_cols = IndicatorScorer._get_data_columns(row)
         score = 0.0
@@ -523,7 +532,7 @@ class IndicatorScorer:
         return score
 
     @staticmethod
-    def score_pen_2(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_pen_2(row: Row, col_mapping: dict = None) -> Optional[float]:
         """pen_2: Internal conflicts (quarterly/annual counts + media) -> -3 to +1"""
         values = IndicatorScorer._get_numeric_values(row)
         data_cols = IndicatorScorer._get_data_columns(row)
@@ -561,7 +570,7 @@ class IndicatorScorer:
         return score
 
     @staticmethod
-    def score_pen_3(row: pd.Series, col_mapping: dict = None) -> Optional[float]:
+    def score_pen_3(row: Row, col_mapping: dict = None) -> Optional[float]:
         """pen_3: Law enforcement data (3 yes/no) -> -5 to +3"""
         data_cols = IndicatorScorer._get_data_columns(row)
         score = 0.0
@@ -596,7 +605,7 @@ class IndicatorScorer:
     # ============ MAIN SCORING METHOD ============
 
     @classmethod
-    def score_indicator(cls, indicator_code: str, row: pd.Series) -> Optional[float]:
+    def score_indicator(cls, indicator_code: str, row: Row) -> Optional[float]:
         """Score any indicator"""
         scoring_func = getattr(cls, f"score_{indicator_code}", None)
 
@@ -618,3 +627,40 @@ class IndicatorScorer:
             import traceback
             logger.error(traceback.format_exc())
             return 0.0
+
+    @classmethod
+    def score_batch(cls, indicator_code: str, rows: Iterable[Row]) -> np.ndarray:
+        """
+        Score every row of one sheet with the same indicator.
+
+        Returns a float array aligned with rows. Like score_indicator, rows the rule
+        can't score (None / errors) get 0.0; the scoring function is resolved once and
+        the result is logged once per sheet instead of once per row.
+        """
+        rows = list(rows)
+        scoring_func = getattr(cls, f"score_{indicator_code}", None)
+
+        if not scoring_func:
+            logger.warning(f"No scoring function for {indicator_code}")
+            return np.zeros(len(rows))
+
+        scores = np.zeros(len(rows))
+        unscored = 0
+        for i, row in enumerate(rows):
+            try:
+                score = scoring_func(row, {})
+            except Exception as e:
+                logger.error(f"Error scoring {indicator_code}: {e}")
+                import traceback
+                logger.error(traceback.format_exc())
+                continue
+
+            if score is None:
+                unscored += 1
+                continue
+            scores[i] = score
+
+        if unscored:
+            logger.warning(f"{indicator_code}: {unscored} row(s) returned None, converted to 0.0")
+        logger.info(f"{indicator_code}: scored {len(rows)} row(s)")
+        return scores
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse, FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, RedirectResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 import logging
 import os
@@ -51,6 +52,7 @@ except Exception as e:
     logger.warning("⚠ Some features may not work correctly")
 
 # Create app with /api docs path
+# Route results are encoded with orjson (C encoder, bytes straight to the socket)
 app = FastAPI(
     title=settings.api_title,
     version=settings.api_version,
@@ -58,6 +60,7 @@ app = FastAPI(
     docs_url="/api/docs",
     openapi_url="/api/openapi.json",
     redoc_url="/api/redoc",
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS from environment (narrow CORS for production security)
@@ -79,6 +82,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Rating/methodology/map JSON is highly repetitive; compress anything over 1 KB
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 
 # ============================================================================
 # Static Files Configuration (для единого развертывания frontend+backend)
@@ -98,6 +104,12 @@ else:
     SERVE_FRONTEND = False
 
 
+@app.on_event("shutdown")
+def shutdown_workers():
+    """Stop the worker processes used to score multi-sheet imports"""
+    data_import_routes.shutdown_sheet_pool()
+
+
 # Health check endpoint (root level for container healthchecks)
 @app.get("/health")
 async def health_check():
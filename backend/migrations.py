@@ -92,6 +92,188 @@ def apply_leader_name_column_migration():
             pass
 
 
+def apply_geojson_column_migration():
+    """
+    Migration: Add dim_mo.geojson for databases created before the column was in the model.
+    Runs once at startup so the /run-migration and /migrate-add-geojson endpoints
+    don't have to issue DDL against dim_mo.
+    """
+    try:
+        inspector = inspect(engine)
+        columns = [col['name'] for col in inspector.get_columns('dim_mo')]
+
+        if 'geojson' in columns:
+            logger.info("✓ dim_mo.geojson column already exists")
+            return
+
+        logger.info("🔄 Running migration: Adding geojson column to dim_mo...")
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE dim_mo ADD COLUMN geojson JSON"))
+        logger.info("✓ Column geojson created")
+    except Exception as e:
+        logger.error(f"✗ geojson column migration failed: {str(e)}")
+
+
+def apply_fact_summary_snapshot_columns_migration():
+    """
+    Migration: Add fact_summary.blocks_json / penalties_json (prebuilt rating snapshots)
+    for databases created before the columns were in the model.
+    """
+    try:
+        inspector = inspect(engine)
+        columns = [col['name'] for col in inspector.get_columns('fact_summary')]
+        missing = [name for name in ('blocks_json', 'penalties_json') if name not in columns]
+
+        if not missing:
+            logger.info("✓ fact_summary snapshot columns already exist")
+            return
+
+        logger.info(f"🔄 Running migration: Adding {', '.join(missing)} to fact_summary...")
+        with engine.begin() as conn:
+            for name in missing:
+                conn.execute(text(f"ALTER TABLE fact_summary ADD COLUMN {name} JSON"))
+        logger.info("✓ fact_summary snapshot columns created")
+    except Exception as e:
+        logger.error(f"✗ fact_summary snapshot columns migration failed: {str(e)}")
+
+
+def apply_mo_name_search_index_migration():
+    """
+    Migration: Index dim_mo.mo_name for case-insensitive lookups.
+    lower(mo_name) serves exact/prefix matches; a pg_trgm GIN index (when the
+    extension is available) serves mo_name ILIKE '%...%' in leader/boundary updates.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    session = SessionLocal()
+    try:
+        session.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_dim_mo_name_lower
+            ON dim_mo (lower(mo_name) text_pattern_ops)
+        """))
+        session.commit()
+        logger.info("✓ lower(mo_name) index on dim_mo ready")
+
+        try:
+            session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            session.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_dim_mo_name_trgm
+                ON dim_mo USING gin (mo_name gin_trgm_ops)
+            """))
+            session.commit()
+            logger.info("✓ Trigram index on dim_mo.mo_name ready")
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"⚠ pg_trgm unavailable, skipping trigram index: {str(e)}")
+    except Exception as e:
+        session.rollback()
+        logger.error(f"✗ MO name index migration failed: {str(e)}")
+    finally:
+        session.close()
+
+
+def ensure_fact_indicator_unique_key():
+    """
+    Migration: Make sure fact_indicator has a unique key on (mo_id, period_id, ind_id, version_id).
+    Imports upsert with ON CONFLICT on these columns; tables created before
+    uq_fact_indicator was added to the model don't have it.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    session = SessionLocal()
+    try:
+        key = ['mo_id', 'period_id', 'ind_id', 'version_id']
+        inspector = inspect(engine)
+        unique_keys = [c['column_names'] for c in inspector.get_unique_constraints('fact_indicator')]
+        unique_keys += [i['column_names'] for i in inspector.get_indexes('fact_indicator') if i.get('unique')]
+
+        if any(sorted(cols) == sorted(key) for cols in unique_keys):
+            logger.info("✓ fact_indicator unique key already exists")
+            return
+
+        logger.info("🔄 Adding unique key to fact_indicator...")
+
+        # Keep the most recent row of any duplicate group
+        result = session.execute(text("""
+            DELETE FROM fact_indicator f
+            USING fact_indicator newer
+            WHERE f.mo_id = newer.mo_id
+              AND f.period_id = newer.period_id
+              AND f.ind_id = newer.ind_id
+              AND f.version_id = newer.version_id
+              AND f.fact_ind_id < newer.fact_ind_id
+        """))
+        if result.rowcount:
+            logger.info(f"✓ Removed {result.rowcount} duplicate fact_indicator rows")
+
+        session.execute(text("""
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_fact_indicator
+            ON fact_indicator (mo_id, period_id, ind_id, version_id)
+        """))
+        session.commit()
+        logger.info("✓ fact_indicator unique key created")
+
+    except Exception as e:
+        session.rollback()
+        logger.error(f"✗ fact_indicator unique key migration failed: {str(e)}")
+    finally:
+        session.close()
+
+
+def apply_fact_indicator_lookup_index_migration():
+    """
+    Migration: Index fact_indicator on (mo_id, period_id, version_id).
+    Summary calculations and per-MO indicator queries filter on exactly these columns;
+    INCLUDE (value_raw, score) lets the aggregations run as index-only scans.
+    Built CONCURRENTLY (outside a transaction) so startup does not lock out imports.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_indicator_mo_period_version
+                ON fact_indicator (mo_id, period_id, version_id)
+                INCLUDE (value_raw, score)
+            """))
+        logger.info("✓ fact_indicator (mo_id, period_id, version_id) index ready")
+    except Exception as e:
+        logger.error(f"✗ fact_indicator lookup index migration failed: {str(e)}")
+
+
+def apply_rating_index_migration():
+    """
+    Migration: Composite indexes for the rating page.
+    fact_summary is filtered by (period_id, version_id) and sorted by score_total or
+    score_public with LIMIT, so matching indexes let Postgres walk the index instead of
+    sorting; fact_penalty is read per page by (mo_id, period_id, version_id).
+    fact_indicator needs no new index: uq_fact_indicator and
+    ix_fact_indicator_mo_period_version already lead with (mo_id, period_id).
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    indexes = {
+        "ix_fact_summary_period_version_score_total":
+            "fact_summary (period_id, version_id, score_total DESC)",
+        "ix_fact_summary_period_version_score_public":
+            "fact_summary (period_id, version_id, score_public DESC)",
+        "ix_fact_penalty_mo_period_version":
+            "fact_penalty (mo_id, period_id, version_id)",
+    }
+
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for name, definition in indexes.items():
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+        logger.info(f"✓ Rating indexes ready ({len(indexes)})")
+    except Exception as e:
+        logger.error(f"✗ Rating index migration failed: {str(e)}")
+
+
 def apply_dim_indicator_columns_migration():
     """
     Migration: Fix dim_indicator table to include block_id and criteria_order columns
@@ -496,101 +678,63 @@ def implement_official_methodology():
         except:
             pass
 
-def calculate_fact_summary_from_indicators():
+def calculate_fact_summary_from_indicators(period_id=None):
     """
     Calculate FactSummary (aggregated scores) from FactIndicator (detailed scores).
     This populates the summary table that the API reads from.
+
+    period_id: recalculate only this period (e.g. right after an import); all periods when None.
     """
     logger.info("🔄 Running migration: Calculate FactSummary from FactIndicator...")
 
     try:
         session = SessionLocal()
 
-        # Get all unique MO, Period combinations that have data
-        result = session.execute(text("""
-            SELECT DISTINCT mo_id, period_id, COALESCE(version_id, 1) as version_id
-            FROM fact_indicator
-            WHERE score IS NOT NULL
-        """))
-
-        combinations = result.fetchall()
-        logger.info(f"  Found {len(combinations)} MO-Period combinations with data")
-
-        inserted = 0
-        for mo_id, period_id, version_id in combinations:
-            # Calculate PUBLIC score (sum of pub_* criteria)
-            public_result = session.execute(text("""
-                SELECT SUM(fi.score) as total
-                FROM fact_indicator fi
-                JOIN dim_indicator di ON fi.ind_id = di.ind_id
-                WHERE fi.mo_id = :mo_id
-                    AND fi.period_id = :period_id
-                    AND di.rating_type = 'ПУБЛИЧНЫЙ'
-            """), {"mo_id": mo_id, "period_id": period_id})
-            public_score = public_result.scalar() or 0.0
-
-            # Calculate CLOSED score (sum of closed_* criteria)
-            closed_result = session.execute(text("""
-                SELECT SUM(fi.score) as total
+        # One statement: every MO/period/version that has data gets its public, closed and
+        # penalty sums (per MO and period), total = max(0, sum of the three) and risk zone
+        period_filter = "AND fi.period_id = :period_id" if period_id is not None else ""
+        result = session.execute(text(f"""
+            INSERT INTO fact_summary (mo_id, period_id, version_id, score_public, score_closed, score_penalties, score_total, zone, updated_at)
+            SELECT c.mo_id, c.period_id, c.version_id,
+                   s.score_public, s.score_closed, s.score_penalties,
+                   GREATEST(0.0, s.score_public + s.score_closed + s.score_penalties),
+                   CASE
+                       WHEN s.score_public + s.score_closed + s.score_penalties >= 53 THEN 'Зелёная'
+                       WHEN s.score_public + s.score_closed + s.score_penalties >= 29 THEN 'Жёлтая'
+                       ELSE 'Красная'
+                   END,
+                   NOW()
+            FROM (
+                SELECT DISTINCT fi.mo_id, fi.period_id, COALESCE(fi.version_id, 1) AS version_id
                 FROM fact_indicator fi
-                JOIN dim_indicator di ON fi.ind_id = di.ind_id
-                WHERE fi.mo_id = :mo_id
-                    AND fi.period_id = :period_id
-                    AND di.rating_type = 'ЗАКРЫТЫЙ'
-            """), {"mo_id": mo_id, "period_id": period_id})
-            closed_score = closed_result.scalar() or 0.0
-
-            # Calculate PENALTIES (sum of pen_* criteria - these are negative)
-            penalties_result = session.execute(text("""
-                SELECT SUM(fi.score) as total
+                WHERE fi.score IS NOT NULL
+                    {period_filter}
+            ) c
+            JOIN (
+                SELECT fi.mo_id, fi.period_id,
+                       COALESCE(SUM(fi.score) FILTER (WHERE di.rating_type = 'ПУБЛИЧНЫЙ'), 0.0) AS score_public,
+                       COALESCE(SUM(fi.score) FILTER (WHERE di.rating_type = 'ЗАКРЫТЫЙ'), 0.0) AS score_closed,
+                       COALESCE(SUM(fi.score) FILTER (WHERE di.is_penalty = true), 0.0) AS score_penalties
                 FROM fact_indicator fi
                 JOIN dim_indicator di ON fi.ind_id = di.ind_id
-                WHERE fi.mo_id = :mo_id
-                    AND fi.period_id = :period_id
-                    AND di.is_penalty = true
-            """), {"mo_id": mo_id, "period_id": period_id})
-            penalties = penalties_result.scalar() or 0.0
-
-            # Calculate total score: simply add public + closed + penalties
-            # No averaging! Direct sum of all three components
-            total_score = public_score + closed_score + penalties
-
-            # Ensure score doesn't go below 0 (penalties can make it negative, but we cap at 0)
-            total_score = max(0.0, total_score)
-
-            # Determine risk zone
-            if total_score >= 53:
-                zone = 'Зелёная'
-            elif total_score >= 29:
-                zone = 'Жёлтая'
-            else:
-                zone = 'Красная'
-
-            # Insert or update FactSummary
-            session.execute(text("""
-                INSERT INTO fact_summary (mo_id, period_id, version_id, score_public, score_closed, score_penalties, score_total, zone, updated_at)
-                VALUES (:mo_id, :period_id, :version_id, :score_public, :score_closed, :score_penalties, :score_total, :zone, NOW())
-                ON CONFLICT (mo_id, period_id, version_id) DO UPDATE SET
-                    score_public = :score_public,
-                    score_closed = :score_closed,
-                    score_penalties = :score_penalties,
-                    score_total = :score_total,
-                    zone = :zone,
-                    updated_at = NOW()
-            """), {
-                "mo_id": mo_id,
-                "period_id": period_id,
-                "version_id": version_id,
-                "score_public": public_score,
-                "score_closed": closed_score,
-                "score_penalties": penalties,
-                "score_total": total_score,
-                "zone": zone
-            })
-            inserted += 1
+                WHERE 1 = 1
+                    {period_filter}
+                GROUP BY fi.mo_id, fi.period_id
+            ) s ON s.mo_id = c.mo_id AND s.period_id = c.period_id
+            ON CONFLICT (mo_id, period_id, version_id) DO UPDATE SET
+                score_public = EXCLUDED.score_public,
+                score_closed = EXCLUDED.score_closed,
+                score_penalties = EXCLUDED.score_penalties,
+                score_total = EXCLUDED.score_total,
+                zone = EXCLUDED.zone,
+                updated_at = NOW()
+        """), {"period_id": period_id})
+        inserted = result.rowcount
+        refreshed = refresh_fact_summary_snapshots(session, period_id)
 
         session.commit()
         logger.info(f"  ✓ Calculated and inserted {inserted} FactSummary records")
+        logger.info(f"  ✓ Refreshed {refreshed} rating snapshots")
         session.close()
 
     except Exception as e:
@@ -602,6 +746,86 @@ def calculate_fact_summary_from_indicators():
             pass
 
 
+# Block -> criteria tree of one MO as JSON, in the shape the rating page returns it.
+# {facts} is a (mo_id, ind_id, score) row source with at most one row per indicator for
+# the MO and {fact_match} the join condition that picks that MO's rows. Plain json (not
+# jsonb) keeps the key order of the objects.
+RATING_BLOCKS_JSON_SQL = """
+    SELECT COALESCE(json_agg(b ORDER BY b.block_order, b.block_id), '[]'::json)
+    FROM (
+        SELECT blk.block_id, blk.block_name, blk.block_order,
+               COALESCE(SUM(fi.score), 0) AS score,
+               COUNT(ind.ind_id) AS criteria_count,
+               COALESCE(
+                   json_agg(json_build_object(
+                       'code', ind.code,
+                       'name', ind.name,
+                       'description', ind.description,
+                       'is_public', ind.is_public,
+                       'score', COALESCE(fi.score, 0)
+                   ) ORDER BY ind.weight DESC, ind.ind_id) FILTER (WHERE ind.ind_id IS NOT NULL),
+                   '[]'::json
+               ) AS criteria
+        FROM dim_criteria_block blk
+        LEFT JOIN dim_indicator ind ON ind.block_id = blk.block_id
+        LEFT JOIN {facts} fi ON fi.ind_id = ind.ind_id AND {fact_match}
+        GROUP BY blk.block_id, blk.block_name, blk.block_order
+    ) b
+"""
+
+# Penalty list of one MO as JSON; {penalty_match} filters fact_penalty fp to that MO's rows
+RATING_PENALTIES_JSON_SQL = """
+    SELECT COALESCE(json_agg(json_build_object(
+               'code', p.code,
+               'name', p.name,
+               'description', p.description,
+               'block', COALESCE(NULLIF(p.block, ''), 'Штрафные критерии'),
+               'score', COALESCE(fp.score_negative, 0)
+           ) ORDER BY fp.fact_pen_id), '[]'::json)
+    FROM fact_penalty fp
+    JOIN dim_penalty p ON p.pen_id = fp.pen_id
+    WHERE {penalty_match}
+"""
+
+
+def refresh_fact_summary_snapshots(session, period_id=None):
+    """
+    Rebuild fact_summary.blocks_json / penalties_json: the block -> criteria tree and the
+    penalty list the rating page shows for that MO, period and methodology version.
+    Called wherever summary scores are recalculated, so the snapshot and the scores in the
+    same row stay in step; the rating endpoint falls back to live queries for NULL snapshots.
+    Does not commit. Returns the number of refreshed rows.
+    """
+    same_row = "{alias}.mo_id = fs.mo_id AND {alias}.period_id = fs.period_id AND {alias}.version_id = fs.version_id"
+    blocks_sql = RATING_BLOCKS_JSON_SQL.format(facts="fact_indicator", fact_match=same_row.format(alias="fi"))
+    penalties_sql = RATING_PENALTIES_JSON_SQL.format(penalty_match=same_row.format(alias="fp"))
+    period_filter = "WHERE fs.period_id = :period_id" if period_id is not None else ""
+
+    result = session.execute(text(f"""
+        UPDATE fact_summary fs
+        SET blocks_json = ({blocks_sql}),
+            penalties_json = ({penalties_sql})
+        {period_filter}
+    """), {"period_id": period_id})
+    return result.rowcount
+
+
+def clear_fact_summary_snapshots(session, period_id=None):
+    """
+    NULL fact_summary.blocks_json / penalties_json (for one period or all), so the rating
+    endpoint builds the trees live until the next refresh_fact_summary_snapshots.
+    For writers of fact_indicator / dim_indicator / fact_penalty that don't recalculate
+    the summary in the same transaction. Does not commit. Returns the number of cleared rows.
+    """
+    period_filter = "AND period_id = :period_id" if period_id is not None else ""
+    result = session.execute(text(f"""
+        UPDATE fact_summary
+        SET blocks_json = NULL, penalties_json = NULL
+        WHERE (blocks_json IS NOT NULL OR penalties_json IS NOT NULL) {period_filter}
+    """), {"period_id": period_id})
+    return result.rowcount
+
+
 def fix_zero_rating_scores():
     """
     Migration: Fix zero rating scores by ensuring indicators have proper rating_type
@@ -714,9 +938,15 @@ def run_all_migrations():
 
     # Order matters! Fix table structure first, then add data
     apply_dim_indicator_columns_migration()     # Fix dim_indicator table structure
+    apply_geojson_column_migration()            # Add geojson column to dim_mo
+    apply_fact_summary_snapshot_columns_migration()  # Rating snapshot columns on fact_summary
+    apply_mo_name_search_index_migration()      # Index mo_name for ILIKE lookups
     apply_leader_name_column_migration()        # Add leader_name column and data
     apply_criteria_blocks_migration()           # Create criteria blocks
     ensure_proper_indicator_codes()             # Ensure indicators have proper codes (pm_*, ca_*, etc)
+    ensure_fact_indicator_unique_key()          # Unique key used by import upserts
+    apply_fact_indicator_lookup_index_migration()  # (mo_id, period_id, version_id) lookups
+    apply_rating_index_migration()              # fact_summary sort / fact_penalty page indexes
     fix_fact_indicator_scores()                 # Fix NULL scores in fact_indicator
     implement_official_methodology()            # Implement official methodology
     fix_zero_rating_scores()                    # Fix zero rating scores (NEW)
@@ -221,6 +221,8 @@ class FactSummary(Base):
     score_penalties = Column(Float)
     score_total = Column(Float)
     zone = Column(String(20))
+    blocks_json = Column(JSON)  # Снимок блоков/критериев для рейтинга (обновляется вместе с баллами)
+    penalties_json = Column(JSON)  # Снимок штрафов для рейтинга
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     # Relationships
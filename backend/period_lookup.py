@@ -0,0 +1,37 @@
+"""
+In-process lookup of "YYYY-MM" period dates to period_id, shared by the
+rating and map routes.
+
+dim_period holds a few dozen rows that are created and deleted only by
+import/cleanup writes, so the mapping is dropped on every commit.
+"""
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import and_, event
+from sqlalchemy.orm import Session
+
+from models import DimPeriod
+
+# Only periods that exist are remembered; unknown dates are re-queried
+_PERIOD_ID_BY_DATE = {}
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_period_ids(session):
+    _PERIOD_ID_BY_DATE.clear()
+
+
+def period_id_for_date(db: Session, period_date: date) -> Optional[int]:
+    """period_id of the period containing period_date, or None if there is none"""
+    period_id = _PERIOD_ID_BY_DATE.get(period_date)
+    if period_id is None:
+        row = db.query(DimPeriod.period_id).filter(
+            and_(
+                DimPeriod.date_from <= period_date,
+                DimPeriod.date_to >= period_date,
+            )
+        ).first()
+        if row is not None:
+            period_id = _PERIOD_ID_BY_DATE[period_date] = row.period_id
+    return period_id
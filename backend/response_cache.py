@@ -0,0 +1,100 @@
+"""
+In-process TTL cache for read-only API responses (rating page, comparison,
+methodology versions and scales).
+
+These responses only change when data is imported or cleaned up, so every
+committed session clears the cache; the TTL bounds staleness for writes made
+outside this process (scripts, other workers).
+
+A clear also bumps the cache generation. Callers take cache_generation() before
+querying and pass it to cache_response, which drops the value if a commit
+happened in between, so a response built from pre-import data can't be stored
+after the import cleared the cache.
+"""
+import threading
+import time
+import hashlib
+import logging
+from typing import Any, Hashable, Optional, Tuple
+
+import orjson
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Ключи ограничены параметрами запросов; при переполнении кэш просто сбрасывается
+MAX_ENTRIES = 1024
+
+_cache = {}
+_generation = 0
+_lock = threading.Lock()
+
+
+def get_cached_response(key: Hashable) -> Optional[Any]:
+    """Cached response for key, or None if missing or expired"""
+    entry = _cache.get(key)
+    if entry is None:
+        return None
+    expires_at, value = entry
+    if expires_at < time.monotonic():
+        _cache.pop(key, None)
+        return None
+    return value
+
+
+def cache_generation() -> int:
+    """Current cache generation; take it before running the queries for a response"""
+    return _generation
+
+
+def cache_response(key: Hashable, value: Any, generation: int, ttl: Optional[int] = None) -> None:
+    """
+    Store a response for ttl seconds (settings.response_cache_ttl by default).
+    Skipped if the cache was cleared since `generation` was taken.
+    """
+    ttl = settings.response_cache_ttl if ttl is None else ttl
+    if ttl <= 0:
+        return
+    with _lock:
+        if generation != _generation:
+            return
+        if len(_cache) >= MAX_ENTRIES:
+            _cache.clear()
+        _cache[key] = (time.monotonic() + ttl, value)
+
+
+def clear_response_cache() -> None:
+    """Drop all cached responses and start a new generation"""
+    global _generation
+    with _lock:
+        _generation += 1
+        if _cache:
+            logger.info(f"🔄 Response cache cleared ({len(_cache)} entries)")
+            _cache.clear()
+
+
+def render_json(content: Any) -> Tuple[bytes, str]:
+    """Encode content like ORJSONResponse does; returns (body, ETag of the body)"""
+    body = orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_response(request: Request, body: bytes, etag: str, max_age: int = 30) -> Response:
+    """JSON response with ETag/Cache-Control; 304 without a body if the client already has it"""
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={max_age}"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        client_tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in client_tags or "*" in client_tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@event.listens_for(Session, "after_commit")
+def _clear_on_commit(session):
+    # Импорт, очистка и админские операции фиксируют изменения через commit()
+    clear_response_cache()
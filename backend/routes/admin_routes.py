@@ -3,14 +3,15 @@ Admin routes - For managing rating data (leaders, indicators, penalties)
 """
 from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, func, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import csv
 import io
 import logging
 
 from database import get_db
 from models import DimMO, DimIndicator, FactIndicator, DimPeriod, DimMethodology
-from migrations import implement_official_methodology
+from migrations import clear_fact_summary_snapshots, implement_official_methodology, refresh_fact_summary_snapshots
 
 router = APIRouter(tags=["admin"])
 logger = logging.getLogger(__name__)
@@ -112,39 +113,39 @@ async def populate_test_data(period: str = "2024-01", db: Session = Depends(get_
         # Get all indicators
         indicators = db.query(DimIndicator).all()
 
-        # Get all MOs
-        mos = db.query(DimMO).all()
+        # Get all MO ids (full rows would drag the geojson boundaries along)
+        mos = db.query(DimMO.mo_id).all()
 
-        inserted_count = 0
-
-        # Insert test data for each MO and indicator
+        # Test data for each MO and indicator
+        facts = []
         for mo in mos:
             for idx, indicator in enumerate(indicators):
-                # Check if already exists
-                existing = db.query(FactIndicator).filter(
-                    FactIndicator.mo_id == mo.mo_id,
-                    FactIndicator.period_id == period_obj.period_id,
-                    FactIndicator.ind_id == indicator.ind_id,
-                    FactIndicator.version_id == methodology.version_id,
-                ).first()
-
-                if not existing:
-                    # Generate test score (varies by MO and indicator)
-                    base_score = (mo.mo_id * 7 + idx * 13) % 100
-                    score = (base_score / 100) * 10  # Scale to 0-10
-
-                    fact = FactIndicator(
-                        mo_id=mo.mo_id,
-                        period_id=period_obj.period_id,
-                        ind_id=indicator.ind_id,
-                        version_id=methodology.version_id,
-                        value_raw=score,
-                        value_norm=score,
-                        score=score,
-                    )
-                    db.add(fact)
-                    inserted_count += 1
-
+                # Generate test score (varies by MO and indicator)
+                base_score = (mo.mo_id * 7 + idx * 13) % 100
+                score = (base_score / 100) * 10  # Scale to 0-10
+
+                facts.append({
+                    "mo_id": mo.mo_id,
+                    "period_id": period_obj.period_id,
+                    "ind_id": indicator.ind_id,
+                    "version_id": methodology.version_id,
+                    "value_raw": score,
+                    "value_norm": score,
+                    "score": score,
+                })
+
+        # Existing rows are kept: one INSERT ... ON CONFLICT DO NOTHING on the
+        # (mo_id, period_id, ind_id, version_id) unique key instead of a SELECT per row
+        inserted_count = 0
+        if facts:
+            stmt = pg_insert(FactIndicator.__table__).on_conflict_do_nothing(
+                index_elements=["mo_id", "period_id", "ind_id", "version_id"]
+            ).returning(FactIndicator.fact_ind_id)
+            inserted_count = len(db.execute(stmt, facts).all())
+
+        # Summary scores aren't recalculated here, but the rating page's criteria
+        # snapshots must show the new facts
+        refresh_fact_summary_snapshots(db, period_obj.period_id)
         db.commit()
 
         return {
@@ -224,6 +225,10 @@ async def cleanup_old_data(db: Session = Depends(get_db)):
         ).delete()
         logger.info(f"  ✓ Deleted {old_indicators} old indicators")
 
+        # Summaries are kept: rebuild their criteria snapshots from what is left
+        refreshed = refresh_fact_summary_snapshots(db)
+        logger.info(f"  ✓ Refreshed {refreshed} rating snapshots")
+
         db.commit()
 
         return {
@@ -254,8 +259,6 @@ async def load_official_methodology_data(db: Session = Depends(get_db)):
     try:
         logger.info("🔄 Loading official methodology data...")
 
-        inserted_count = 0
-
         # Get or create DimPeriod
         from models import DimMethodology, DimPeriod
         period = db.query(DimPeriod).first()
@@ -300,12 +303,12 @@ async def load_official_methodology_data(db: Session = Depends(get_db)):
             DimIndicator.is_penalty == True
         ).all()
 
-        municipalities = db.query(DimMO).all()
+        municipalities_count = db.query(func.count(DimMO.mo_id)).scalar()
 
         logger.info(f"  Found {len(pub_indicators)} PUBLIC indicators")
         logger.info(f"  Found {len(closed_indicators)} CLOSED indicators")
         logger.info(f"  Found {len(penalty_indicators)} PENALTY indicators")
-        logger.info(f"  Found {len(municipalities)} municipalities")
+        logger.info(f"  Found {municipalities_count} municipalities")
         logger.info(f"  Using version_id: {version_id}")
 
         # Data for all municipalities (from CSV analysis)
@@ -372,41 +375,42 @@ async def load_official_methodology_data(db: Session = Depends(get_db)):
                             'pen_1': 0, 'pen_2': 0, 'pen_3': 0},
         }
 
+        # Lookups loaded once: MO and indicator ids, and the (mo, indicator) pairs that
+        # already have a value for this period in any methodology version
+        mo_ids = dict(db.query(DimMO.mo_name, DimMO.mo_id).filter(DimMO.mo_name.in_(list(municipality_data))))
+        ind_ids = dict(db.query(DimIndicator.code, DimIndicator.ind_id))
+        existing = set(db.query(FactIndicator.mo_id, FactIndicator.ind_id).filter(FactIndicator.period_id == period_id))
+
         # Insert data for each municipality and criterion
+        facts = []
         for mo_name, scores in municipality_data.items():
-            mo = db.query(DimMO).filter(DimMO.mo_name == mo_name).first()
-            if not mo:
+            mo_id = mo_ids.get(mo_name)
+            if not mo_id:
                 logger.warning(f"  ⚠️  MO not found: {mo_name}")
                 continue
 
             for criterion_code, score in scores.items():
-                # Find the indicator
-                indicator = db.query(DimIndicator).filter(
-                    DimIndicator.code == criterion_code
-                ).first()
+                ind_id = ind_ids.get(criterion_code)
 
-                if not indicator:
+                if not ind_id:
                     logger.warning(f"  ⚠️  Indicator not found: {criterion_code}")
                     continue
 
-                # Check if already exists
-                existing = db.query(FactIndicator).filter(
-                    FactIndicator.mo_id == mo.mo_id,
-                    FactIndicator.ind_id == indicator.ind_id,
-                    FactIndicator.period_id == period_id,
-                ).first()
-
-                if not existing:
-                    fact = FactIndicator(
-                        mo_id=mo.mo_id,
-                        ind_id=indicator.ind_id,
-                        period_id=period_id,
-                        version_id=version_id,
-                        score=score,
-                    )
-                    db.add(fact)
-                    inserted_count += 1
-
+                if (mo_id, ind_id) not in existing:
+                    facts.append({
+                        "mo_id": mo_id,
+                        "ind_id": ind_id,
+                        "period_id": period_id,
+                        "version_id": version_id,
+                        "score": score,
+                    })
+
+        if facts:
+            db.execute(insert(FactIndicator.__table__), facts)
+        inserted_count = len(facts)
+
+        # Rebuilt by the aggregation below; until then the rating page builds trees live
+        clear_fact_summary_snapshots(db, period_id)
         db.commit()
         logger.info(f"  ✅ Inserted {inserted_count} indicator records")
 
@@ -1,13 +1,28 @@
 """
 API routes for importing CSV data
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import text, func, insert, update, bindparam, event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import logging
 import pandas as pd
+import numpy as np
 import io
+import os
 import json
+import orjson
+import csv
+import re
+import difflib
+import html
+import multiprocessing
+import threading
+import openpyxl
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from bisect import bisect_right
+from itertools import accumulate, repeat
 
 from database import get_db
 from models import DimMO, DimPeriod, DimIndicator, DimMethodology, FactIndicator
@@ -16,13 +31,34 @@ from indicator_scoring import IndicatorScorer
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+_WHITESPACE_RE = re.compile(r'\s+')
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+# Plain decimal number as float() accepts it (sign, fraction, exponent); no inf/nan
+_NUMBER_RE = re.compile(r'\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\s*')
+
+
+# Number cleanup for spreadsheet cells: drop '%' and whitespace (incl. NBSP thousands separators), decimal comma -> dot
+_NUM_CLEAN_RE = re.compile(r'[%\s]')
+_DECIMAL_COMMA = str.maketrans(',', '.')
+
+
+def _clean_number_text(text):
+    """'12,5 %' -> '12.5' in one regex pass and one translate"""
+    return _NUM_CLEAN_RE.sub('', text).translate(_DECIMAL_COMMA)
+
+
+def _parse_number(text, default=None):
+    """float(text) when text is a plain number, else default (regex check instead of try/except)"""
+    return float(text) if _NUMBER_RE.fullmatch(text) else default
+
 
 # ============ UNIFIED OFFICIAL METHODOLOGY IMPORT ============
 # This is the PRIMARY endpoint for importing official methodology data
 # Supports: CSV files, Excel single-sheet, Excel multi-sheet
 
 @router.post("/import-official-methodology")
-async def import_official_methodology(
+def import_official_methodology(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     period_month: str = "2024-01",
     db: Session = Depends(get_db),
@@ -40,12 +76,18 @@ async def import_official_methodology(
     Parameters:
     - file: CSV or Excel file (.xlsx)
     - period_month: Period in YYYY-MM format (default: 2024-01)
+
+    Plain def: parsing, scoring (and waiting on the sheet worker pool) run in the
+    threadpool instead of blocking the event loop for every other request.
     """
     try:
         logger.info(f"=== UNIFIED IMPORT START ===")
         logger.info(f"File: {file.filename}, Type: {file.content_type}")
 
-        content = await file.read()
+        # UploadFile is already spooled (memory, then disk); parse it in place instead of
+        # copying the whole upload into a bytes object
+        upload = file.file
+        upload.seek(0)
 
         # Parse period_month
         from datetime import datetime, timedelta
@@ -59,14 +101,11 @@ async def import_official_methodology(
         date_from = period_date.strftime("%Y-%m-%d")
         date_to = period_end.strftime("%Y-%m-%d")
 
-        # Ensure official methodology exists
-        logger.info("Ensuring official methodology exists...")
-        from migrations import implement_official_methodology
-        implement_official_methodology()
+        # Official methodology (indicators, columns) is set up once at startup by run_all_migrations()
 
         # Get or create methodology version
-        methodology = db.query(DimMethodology).first()
-        if not methodology:
+        version_id = _cached_methodology_id(db)
+        if version_id is None:
             methodology = DimMethodology(
                 version="Official v1",
                 valid_from="2024-01-01",
@@ -75,13 +114,11 @@ async def import_official_methodology(
             db.add(methodology)
             db.commit()
             db.refresh(methodology)
+            version_id = methodology.version_id
 
         # Get or create period
-        period = db.query(DimPeriod).filter(
-            DimPeriod.date_from == date_from
-        ).first()
-
-        if not period:
+        period_id = _cached_period_id(db, date_from)
+        if period_id is None:
             period = DimPeriod(
                 period_type="month",
                 date_from=date_from,
@@ -91,6 +128,7 @@ async def import_official_methodology(
             db.add(period)
             db.commit()
             db.refresh(period)
+            period_id = period.period_id
 
         # Official indicator codes
         official_indicators = [
@@ -105,28 +143,26 @@ async def import_official_methodology(
         if file_extension == 'csv':
             logger.info("Processing as CSV file")
             result = _process_official_methodology_csv(
-                content, db, period, methodology, official_indicators
+                upload, db, period_id, version_id, official_indicators
             )
         elif file_extension in ['xlsx', 'xls']:
             logger.info("Processing as Excel file")
             result = _process_official_methodology_excel(
-                content, db, period, methodology, official_indicators
+                upload, db, period_id, version_id, official_indicators
             )
         else:
             raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_extension}")
 
         # Commit all changes
+        # Снапшоты рейтинга периода устарели: до пересчёта страница строит деревья вживую
+        from migrations import clear_fact_summary_snapshots
+        clear_fact_summary_snapshots(db, period_id)
         db.commit()
         logger.info(f"Data committed to database")
 
-        # Auto-calculate aggregated scores
-        logger.info(f"Auto-calculating aggregated scores for period {period.period_id}...")
-        try:
-            from migrations import calculate_fact_summary_from_indicators
-            calculate_fact_summary_from_indicators()
-            logger.info("✓ Aggregated scores calculated successfully")
-        except Exception as e:
-            logger.error(f"Error calculating aggregated scores: {e}")
+        # Auto-calculate aggregated scores after the response is sent
+        logger.info(f"Scheduling aggregated score calculation for period {period_id}...")
+        background_tasks.add_task(_recalculate_summary_scores, period_id)
 
         logger.info(f"=== UNIFIED IMPORT COMPLETE ===")
 
@@ -135,11 +171,11 @@ async def import_official_methodology(
             "message": "Official methodology data imported successfully!",
             "statistics": result,
             "period": period_month,
-            "period_id": period.period_id,
+            "period_id": period_id,
             "methodology": "Official 16 criteria",
             "next_steps": [
                 "1. Hard refresh Rating tab (Ctrl+F5)",
-                "2. Scores should display with proper aggregation"
+                "2. Scores should display with proper aggregation (recalculated in the background)"
             ]
         }
 
@@ -151,86 +187,403 @@ async def import_official_methodology(
         raise HTTPException(status_code=500, detail=f"Error importing file: {str(e)}")
 
 
-def _process_official_methodology_csv(content, db, period, methodology, official_indicators):
-    """Process CSV file with official methodology data"""
-    df = pd.read_csv(io.BytesIO(content), encoding='utf-8')
-    logger.info(f"CSV: {len(df)} rows, {len(df.columns)} columns")
-    logger.info(f"Columns: {list(df.columns)}")
+def _recalculate_summary_scores(period_id):
+    """Background task: rebuild fact_summary for the freshly imported period only"""
+    try:
+        from migrations import calculate_fact_summary_from_indicators
+        calculate_fact_summary_from_indicators(period_id=period_id)
+        logger.info("✓ Aggregated scores calculated successfully")
+    except Exception as e:
+        logger.error(f"Error calculating aggregated scores: {e}")
+
+
+# Dimension IDs already resolved by earlier imports: date_from -> period_id and
+# methodology version (None = the first methodology) -> version_id. Only IDs are cached,
+# never ORM rows (those are bound to the request's session), and only for rows read back
+# from the database, so a rolled-back create is never cached. Periods and methodologies
+# are deleted only by committed cleanup writes, so both maps are dropped on every commit.
+_PERIOD_ID_CACHE = {}
+_METHODOLOGY_ID_CACHE = {}
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_dim_ids(session):
+    _PERIOD_ID_CACHE.clear()
+    _METHODOLOGY_ID_CACHE.clear()
+
+
+def _cached_period_id(db, date_from):
+    """period_id of the period starting at date_from, or None if it does not exist yet"""
+    period_id = _PERIOD_ID_CACHE.get(date_from)
+    if period_id is None:
+        row = db.query(DimPeriod.period_id).filter(DimPeriod.date_from == date_from).first()
+        if row is not None:
+            period_id = _PERIOD_ID_CACHE[date_from] = row.period_id
+    return period_id
+
+
+def _cached_methodology_id(db, version=None):
+    """version_id of the given methodology version (any methodology if None), or None if missing"""
+    version_id = _METHODOLOGY_ID_CACHE.get(version)
+    if version_id is None:
+        query = db.query(DimMethodology.version_id)
+        if version is not None:
+            query = query.filter(DimMethodology.version == version)
+        row = query.first()
+        if row is not None:
+            version_id = _METHODOLOGY_ID_CACHE[version] = row.version_id
+    return version_id
+
+
+def _load_import_lookups(db, official_indicators):
+    """
+    Preload everything the import loops need to resolve a value into one fact row.
+
+    Returns (mo_lookup, ind_lookup):
+    - mo_lookup: normalized mo_name -> DimMO (see _normalize_mo_name)
+    - ind_lookup: indicator code -> DimIndicator
+    """
+    # Only id and name are needed; the geojson boundaries can be large and are not loaded
+    mo_lookup = {
+        _normalize_mo_name(mo.mo_name): mo
+        for mo in db.query(DimMO).options(load_only(DimMO.mo_id, DimMO.mo_name))
+    }
+
+    ind_lookup = {
+        ind.code: ind
+        for ind in db.query(DimIndicator).filter(DimIndicator.code.in_(official_indicators)).all()
+    }
+
+    return mo_lookup, ind_lookup
+
+
+def _normalize_mo_name(name):
+    """Casefold, drop punctuation and collapse whitespace so spreadsheet spelling variants share one key"""
+    name = _PUNCTUATION_RE.sub(' ', str(name).casefold())
+    return _WHITESPACE_RE.sub(' ', name).strip()
+
+
+# Minimum difflib ratio for the fuzzy fallback; keeps typos, rejects different municipalities
+MO_FUZZY_CUTOFF = 0.85
+
+
+def _match_mo(mo_lookup, mo_name):
+    """
+    Resolve a municipality name against the preloaded lookup without touching the database.
+
+    Exact normalized key first, then substring (as ILIKE '%name%' did), then the closest
+    name by difflib for typos in the spreadsheet.
+    """
+    key = _normalize_mo_name(mo_name)
+    if not key:
+        # Placeholder cells ('-', '...', ' ') would be a substring of every name
+        return None
+
+    mo = mo_lookup.get(key)
+    if mo is not None:
+        return mo
+
+    for name, candidate in mo_lookup.items():
+        if key in name:
+            return candidate
+
+    close = difflib.get_close_matches(key, list(mo_lookup), n=1, cutoff=MO_FUZZY_CUTOFF)
+    if close:
+        logger.info(f"Municipality '{mo_name}' matched fuzzily to '{mo_lookup[close[0]].mo_name}'")
+        return mo_lookup[close[0]]
+
+    return None
+
+
+def _mo_matcher(mo_lookup):
+    """
+    Memoized _match_mo for one import: each distinct name is matched once and an
+    unknown name is logged once, not once per row (or per sheet).
+    """
+    mo_by_name = {}
+
+    def match(mo_name):
+        if mo_name not in mo_by_name:
+            mo = mo_by_name[mo_name] = _match_mo(mo_lookup, mo_name)
+            if mo is None:
+                logger.warning(f"Municipality '{mo_name}' not found")
+        return mo_by_name[mo_name]
+
+    return match
+
+
+def _resolve_mo_column(mo_lookup, names):
+    """
+    Match a whole municipality column with one _match_mo call per distinct name.
+
+    The column is made categorical and rows pick their DimMO by category code.
+    Returns a list aligned with the rows (None where the name is missing or unknown).
+    """
+    names = names.astype('category')
+    cat_to_mo = [_match_mo(mo_lookup, name) for name in names.cat.categories]
+    return [cat_to_mo[code] if code >= 0 else None for code in names.cat.codes]
+
+
+FACT_KEY_COLUMNS = ("mo_id", "period_id", "ind_id", "version_id")
+
+
+# From this many rows on, PostgreSQL upserts go through COPY into a staging table
+FACT_COPY_MIN_ROWS = 1000
+
+
+def _copy_upsert_facts(db, facts, value_columns):
+    """
+    COPY fact rows into a temporary staging table, then upsert them with one
+    INSERT ... SELECT ... ON CONFLICT DO UPDATE (all inside the import transaction).
+    """
+    columns = list(FACT_KEY_COLUMNS) + value_columns
+    column_list = ", ".join(columns)
+
+    # Temp tables skip WAL; same column types as fact_indicator, no constraints
+    db.execute(text(f"""
+        CREATE TEMP TABLE fact_indicator_stage AS
+        SELECT {column_list} FROM fact_indicator WITH NO DATA
+    """))
+
+    buf = io.StringIO()
+    for row in facts:
+        buf.write("\t".join("\\N" if row[c] is None else str(row[c]) for c in columns))
+        buf.write("\n")
+    buf.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_from(buf, "fact_indicator_stage", columns=columns, sep="\t", null="\\N")
+    finally:
+        cursor.close()
+
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in value_columns)
+    db.execute(text(f"""
+        INSERT INTO fact_indicator ({column_list})
+        SELECT {column_list} FROM fact_indicator_stage
+        ON CONFLICT ({", ".join(FACT_KEY_COLUMNS)}) DO UPDATE SET {updates}, updated_at = NOW()
+    """))
+    db.execute(text("DROP TABLE fact_indicator_stage"))
+
+
+def _write_facts(db, facts):
+    """
+    Write collected FactIndicator rows without going through the ORM unit of work.
+
+    facts: list of column dicts (the FACT_KEY_COLUMNS plus score, optionally value_raw).
+    A later row for the same key wins, as a second update would. On PostgreSQL this is
+    one INSERT ... ON CONFLICT DO UPDATE executemany (no read before write), or COPY into
+    a staging table for large uploads; elsewhere existing ids are looked up once and rows
+    split into an insert and an update.
+    """
+    if not facts:
+        return
+
+    facts = list({tuple(row[c] for c in FACT_KEY_COLUMNS): row for row in facts}.values())
+    value_columns = [c for c in facts[0] if c not in FACT_KEY_COLUMNS]
+    table = FactIndicator.__table__
+
+    if db.get_bind().dialect.name == "postgresql":
+        if len(facts) >= FACT_COPY_MIN_ROWS:
+            _copy_upsert_facts(db, facts, value_columns)
+            return
+
+        stmt = pg_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(FACT_KEY_COLUMNS),
+            set_={**{c: stmt.excluded[c] for c in value_columns}, "updated_at": func.now()},
+        )
+        db.execute(stmt, facts)
+        return
+
+    period_ids = {row["period_id"] for row in facts}
+    fact_ids = {
+        (mo_id, period_id, ind_id, version_id): fact_id
+        for mo_id, period_id, ind_id, version_id, fact_id in db.query(
+            FactIndicator.mo_id, FactIndicator.period_id, FactIndicator.ind_id,
+            FactIndicator.version_id, FactIndicator.fact_ind_id
+        ).filter(FactIndicator.period_id.in_(period_ids))
+    }
+
+    inserts = []
+    updates = []
+    for row in facts:
+        fact_id = fact_ids.get(tuple(row[c] for c in FACT_KEY_COLUMNS))
+        if fact_id:
+            updates.append({"b_fact_id": fact_id, **{f"b_{c}": row[c] for c in value_columns}})
+        else:
+            inserts.append(row)
+
+    if inserts:
+        db.execute(insert(table), inserts)
+
+    if updates:
+        db.execute(
+            update(table)
+            .where(table.c.fact_ind_id == bindparam("b_fact_id"))
+            .values(**{c: bindparam(f"b_{c}") for c in value_columns}),
+            updates,
+        )
+
+
+def _clean_numeric_column(series, unparsed=None):
+    """
+    Vectorized form of the per-cell _clean_number_text() + float().
+
+    Empty cells stay NaN. Cells that don't parse become `unparsed` (NaN when None).
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+
+    present = series.notna() & (series != '')
+    cleaned = (
+        series.astype(str)
+        .str.replace(_NUM_CLEAN_RE, '', regex=True)
+        .str.translate(_DECIMAL_COMMA)
+    )
+    numeric = pd.to_numeric(cleaned, errors='coerce')
+
+    if unparsed is not None:
+        numeric = numeric.fillna(unparsed)
+
+    return numeric.where(present)
+
+
+def _indicator_columns(columns, official_indicators):
+    """{column label: indicator code} for headers equal to an official code (case-insensitive)"""
+    indicator_codes = set(official_indicators)
+    col_to_code = {}
+    for col in columns:
+        col_str = str(col).strip()
+        if col_str in indicator_codes:
+            col_to_code[col] = col_str
+        elif col_str.lower() in indicator_codes:
+            col_to_code[col] = col_str.lower()
+    return col_to_code
+
+
+def _melt_indicator_values(df, mo_col, value_cols, unparsed=None):
+    """
+    Long form of a wide indicator sheet: one (mo_name, column, value) row per filled cell
+    of a named municipality, values cleaned in one vectorized pass (see _clean_numeric_column).
+    """
+    names = df[mo_col]
+    df = df[names.notna() & (names != '')]
+    long = df.melt(id_vars=[mo_col], value_vars=value_cols,
+                   var_name='indicator_column', value_name='indicator_value')
+    long['indicator_value'] = _clean_numeric_column(long['indicator_value'], unparsed=unparsed)
+    return long[long['indicator_value'].notna()]
+
+
+def _first_numeric_column(df, columns, sample_size=10, threshold=0.5):
+    """
+    First of `columns` whose first `sample_size` non-empty cells are at least `threshold` numeric.
+
+    All columns are checked in one pass: cells are converted with to_numeric and the sample of
+    each column is picked with a cumulative count of non-empty cells. None if no column qualifies.
+    """
+    if not columns:
+        return None
+
+    frame = df[columns]
+    present = frame.notna()
+    in_sample = present & (present.cumsum() <= sample_size)
+    numeric = frame.apply(pd.to_numeric, errors='coerce').notna() & in_sample
+
+    sampled = in_sample.sum()
+    ratios = numeric.sum() / sampled.where(sampled > 0)
+    matches = ratios.index[ratios >= threshold]
+    if len(matches) == 0:
+        return None
+
+    col = matches[0]
+    logger.debug(f"Found numeric column '{col}' with {numeric[col].sum()}/{sampled[col]} numeric values")
+    return col
+
+
+# Municipality name column in official methodology CSVs, in order of preference
+MO_NAME_COLUMNS = ('Муниципалитет', 'municipalitet', 'mo_name')
+
+
+# Cells pandas.read_csv treats as missing
+_CSV_NA_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-NaN', '-nan', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+
+def _read_methodology_csv(source):
+    """Parse an official methodology CSV (binary file object) with the stdlib csv module: (header, rows as lists of strings)"""
+    text_stream = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+    try:
+        rows = csv.reader(text_stream)
+        header = next(rows, [])
+        return header, list(rows)
+    finally:
+        # Leave the upload open for its owner
+        text_stream.detach()
+
+
+def _parse_csv_score(value):
+    """Indicator score from a CSV cell: None when blank, 0.0 when the text isn't a number"""
+    if value in _CSV_NA_VALUES:
+        return None
+    return _parse_number(_clean_number_text(value), 0.0)
+
+
+def _process_official_methodology_csv(source, db, period_id, version_id, official_indicators):
+    """Process CSV file (binary file object) with official methodology data"""
+    header, rows = _read_methodology_csv(source)
+    logger.info(f"CSV: {len(rows)} rows, {len(header)} columns")
+    logger.info(f"Columns: {header}")
 
     values_loaded = 0
     rows_processed = 0
+    mo_lookup, ind_lookup = _load_import_lookups(db, official_indicators)
+    facts = []
+
+    col_idx = {col: i for i, col in enumerate(header)}
+    mo_pos = next((col_idx[c] for c in MO_NAME_COLUMNS if c in col_idx), None)
+
+    # Only columns whose indicator exists are read; a missing indicator is reported once
+    missing = [code for code in official_indicators if code in col_idx and code not in ind_lookup]
+    if missing:
+        logger.warning(f"Indicators not found: {missing}")
+    indicator_positions = [
+        (ind_lookup[code], col_idx[code]) for code in official_indicators
+        if code in col_idx and code in ind_lookup
+    ]
+    match_mo = _mo_matcher(mo_lookup)
 
-    for _, row in df.iterrows():
-        mo_name = row.get('Муниципалитет') or row.get('municipalitet') or row.get('mo_name')
-
-        if pd.isna(mo_name) or mo_name == '':
+    for row in rows:
+        mo_name = row[mo_pos] if mo_pos is not None and mo_pos < len(row) else ''
+        if mo_name in _CSV_NA_VALUES:
             continue
 
         rows_processed += 1
 
         # Find MO by name
-        mo = db.query(DimMO).filter(
-            text("mo_name ILIKE :name")
-        ).params(name=f"%{mo_name}%").first()
-
+        mo = match_mo(mo_name)
         if not mo:
-            logger.warning(f"Municipality not found: {mo_name}")
             continue
 
         # Load official indicators
-        for ind_code in official_indicators:
-            # Check if column exists in CSV
-            if ind_code not in row:
-                continue
-
-            value = row[ind_code]
-            if pd.isna(value) or value == '':
-                continue
-
-            # Find indicator
-            indicator = db.query(DimIndicator).filter(
-                DimIndicator.code == ind_code
-            ).first()
-
-            if not indicator:
-                logger.warning(f"Indicator not found: {ind_code}")
+        for indicator, pos in indicator_positions:
+            value_float = _parse_csv_score(row[pos]) if pos < len(row) else None
+            if value_float is None:
                 continue
 
-            # Convert value to float
-            try:
-                if isinstance(value, str):
-                    value_clean = value.replace('%', '').replace(' ', '').replace(',', '.')
-                    try:
-                        value_float = float(value_clean)
-                    except:
-                        value_float = 0.0
-                else:
-                    value_float = float(value)
-            except:
-                value_float = 0.0
-
-            # Check if exists
-            existing = db.query(FactIndicator).filter(
-                FactIndicator.mo_id == mo.mo_id,
-                FactIndicator.period_id == period.period_id,
-                FactIndicator.ind_id == indicator.ind_id,
-                FactIndicator.version_id == methodology.version_id
-            ).first()
-
-            if existing:
-                existing.score = value_float
-            else:
-                fact = FactIndicator(
-                    mo_id=mo.mo_id,
-                    period_id=period.period_id,
-                    ind_id=indicator.ind_id,
-                    version_id=methodology.version_id,
-                    score=value_float,
-                )
-                db.add(fact)
+            facts.append({
+                "mo_id": mo.mo_id,
+                "period_id": period_id,
+                "ind_id": indicator.ind_id,
+                "version_id": version_id,
+                "score": value_float,
+            })
 
             values_loaded += 1
 
+    _write_facts(db, facts)
+
     return {
         "rows_processed": rows_processed,
         "values_loaded": values_loaded,
@@ -238,10 +591,19 @@ def _process_official_methodology_csv(content, db, period, methodology, official
     }
 
 
-def _process_official_methodology_excel(content, db, period, methodology, official_indicators):
-    """Process Excel file with official methodology data (multi-sheet or single-sheet)"""
-    xls = pd.ExcelFile(io.BytesIO(content))
-    sheet_names = xls.sheet_names
+def _process_official_methodology_excel(source, db, period_id, version_id, official_indicators):
+    """Process Excel file (binary file object) with official methodology data (multi-sheet or single-sheet)"""
+    # The workbook is parsed once (read-only) and shared by both formats
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        return _process_official_methodology_workbook(source, wb, db, period_id, version_id, official_indicators)
+    finally:
+        wb.close()
+
+
+def _process_official_methodology_workbook(source, wb, db, period_id, version_id, official_indicators):
+    """Detect the workbook format and load it"""
+    sheet_names = wb.sheetnames
     logger.info(f"Excel file has {len(sheet_names)} sheets")
     for i, sn in enumerate(sheet_names):
         logger.info(f"  Sheet {i+1}: '{sn}'")
@@ -256,13 +618,13 @@ def _process_official_methodology_excel(content, db, period, methodology, offici
     if is_multisheet:
         # Format 2: Multiple sheets - one per criterion with raw data
         values_loaded, rows_proc = _process_multisheet_format(
-            content, xls, sheet_names, db, period, methodology, official_indicators
+            source, wb, sheet_names, db, period_id, version_id, official_indicators
         )
         total_rows_processed = rows_proc
     else:
         # Format 1: Single sheet with pre-calculated scores
         values_loaded, rows_proc = _process_singlesheet_format(
-            content, xls, sheet_names, db, period, methodology, official_indicators
+            wb, sheet_names, db, period_id, version_id, official_indicators
         )
         total_rows_processed = rows_proc
 
@@ -274,256 +636,421 @@ def _process_official_methodology_excel(content, db, period, methodology, offici
     }
 
 
+# A sheet whose name contains any of these looks like a criterion sheet (one alternation regex)
+CRITERION_SHEET_KEYWORDS = (
+    'выполнение', 'позиционирование', 'проектная', 'молодежи', 'ветеран',
+    'кадровый', 'гранты', 'партийная', 'мандатов', 'показатели', 'экономическ',
+    'конфликты', 'правоохранительных'
+)
+_CRITERION_SHEET_RE = re.compile('|'.join(map(re.escape, CRITERION_SHEET_KEYWORDS)))
+
+
+def _count_criterion_sheets(sheet_names):
+    """How many sheet names contain a criterion keyword"""
+    return sum(1 for sheet in sheet_names if _CRITERION_SHEET_RE.search(sheet.lower()))
+
+
 def _detect_multisheet_format(sheet_names):
     """Detect if Excel file is multi-sheet format (one per indicator)"""
     if len(sheet_names) <= 1:
         return False
 
-    criterion_keywords = [
-        'выполнение', 'позиционирование', 'проектная', 'молодежи', 'ветеран',
-        'кадровый', 'гранты', 'партийная', 'мандатов', 'показатели', 'экономическ',
-        'конфликты', 'правоохранительных'
-    ]
+    return _count_criterion_sheets(sheet_names) >= 10
 
-    matching_sheets = sum(1 for sheet in sheet_names
-                         if any(kw in sheet.lower() for kw in criterion_keywords))
 
-    return matching_sheets >= 10
+def _sheet_code_matcher(name_to_code):
+    """
+    Build sheet_name -> (code, match_kind) for a {criterion name: code} table; (None, None) on no match.
 
+    Exact (case-insensitive) name first. Otherwise one compiled alternation regex finds the
+    longest criterion name inside the sheet name, and one find() over all names joined finds a
+    criterion that contains the sheet name (Excel truncates sheet names to 31 characters).
+    """
+    lower = {name.lower(): code for name, code in name_to_code.items()}
+    names = list(lower)
+    contained_re = re.compile('|'.join(re.escape(name) for name in sorted(names, key=len, reverse=True)))
+    joined = '\n'.join(names)
+    starts = list(accumulate((len(name) + 1 for name in names[:-1]), initial=0))
+
+    def match(sheet_name):
+        sheet_lower = sheet_name.lower()
+
+        code = lower.get(sheet_lower)
+        if code:
+            return code, "exact match"
+
+        found = contained_re.search(sheet_lower)
+        if found:
+            return lower[found.group()], f"partial match: '{found.group()}'"
+
+        pos = joined.find(sheet_lower)
+        if pos >= 0:
+            name = names[bisect_right(starts, pos) - 1]
+            return lower[name], f"partial match: '{name}'"
+
+        return None, None
+
+    return match
+
+
+# Sheet name (as it appears in the official multi-sheet workbook) -> indicator code
+MULTISHEET_CRITERION_CODES = {
+    # PUBLIC
+    "Оценка поддержки руководства": "pub_1",
+    "Выполнение задач АГП": "pub_2",
+    "Позиционирование главы МО": "pub_3",
+    "Проектная деятельность": "pub_4",
+    "Вовлеченность молодежи 1": "pub_5",
+    "Вовлеченность молодежи 2  ": "pub_6",  # Note: sheet name has trailing spaces
+    "Работа главы с ветеранам": "pub_7",
+    "Кадровый управленческий резерв": "pub_8",
+    "Работа с грантами": "pub_9",
+    # CLOSED
+    "Партийное мнение": "closed_1",
+    "Альтернативное мнение": "closed_2",
+    "Показатели АГП (Уровень)": "closed_3",
+    "Показатели АГП (Качество)": "closed_4",
+    "Экономическая привлекательность": "closed_5",
+    "деятельность ветеранов СВО": "closed_7",
+    "Участие в проекте  ЛО": "closed_8",  # Note: sheet name has extra spaces
+    # PENALTY
+    "Конфликты с региональной  ВЛ": "pen_1",  # Note: sheet name has extra spaces
+    "Внутримуниципальные конфликты": "pen_2",
+    "Данные правоохранительных орган": "pen_3",
+}
+
+# Return (code, match_kind) for a sheet name of the official workbook, or (None, None)
+_match_sheet_code = _sheet_code_matcher(MULTISHEET_CRITERION_CODES)
+
+
+def _sheet_header(raw_header):
+    """Column names for a header row, named the way pandas would (Unnamed: N, dup.1)"""
+    header = []
+    seen = {}
+    for i, name in enumerate(raw_header):
+        if name is None or name == '':
+            name = f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        header.append(name)
+    return header
+
+
+def _iter_sheet_records(ws):
+    """Return (header, records) for a read-only worksheet; records lazily yields one {column: value} dict per row"""
+    rows = ws.iter_rows(values_only=True)
+    raw_header = next(rows, None)
+    if raw_header is None:
+        return [], iter(())
+    header = _sheet_header(raw_header)
+    return header, (dict(zip(header, row)) for row in rows)
+
+
+def _sheet_frame(ws):
+    """DataFrame for a read-only worksheet built from streamed rows (first row is the header)"""
+    header, records = _iter_sheet_records(ws)
+    return pd.DataFrame.from_records(list(records), columns=header)
+
+
+# Upper bound on worker processes used to score multi-sheet workbooks. Each worker
+# re-opens the workbook, so past a handful of processes start-up costs more than
+# scoring the remaining sheets (the official workbook has ~20 small sheets)
+MULTISHEET_MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+# One pool for the process, created on first use and shut down with the app. Workers
+# are spawned, not forked: the server is multi-threaded and holds pooled DB sockets
+_sheet_pool = None
+_sheet_pool_lock = threading.Lock()
+
+
+def _get_sheet_pool():
+    """Shared ProcessPoolExecutor (spawn start method) for scoring multi-sheet workbooks"""
+    global _sheet_pool
+    with _sheet_pool_lock:
+        if _sheet_pool is None:
+            _sheet_pool = ProcessPoolExecutor(
+                max_workers=MULTISHEET_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _sheet_pool
 
-def _process_multisheet_format(content, xls, sheet_names, db, period, methodology, official_indicators):
-    """Process multi-sheet Excel format (one sheet per indicator with raw data)"""
 
-    criterion_name_to_code = {
-        # PUBLIC
-        "Оценка поддержки руководства": "pub_1",
-        "Выполнение задач АГП": "pub_2",
-        "Позиционирование главы МО": "pub_3",
-        "Проектная деятельность": "pub_4",
-        "Вовлеченность молодежи 1": "pub_5",
-        "Вовлеченность молодежи 2  ": "pub_6",  # Note: sheet name has trailing spaces
-        "Работа главы с ветеранам": "pub_7",
-        "Кадровый управленческий резерв": "pub_8",
-        "Работа с грантами": "pub_9",
-        # CLOSED
-        "Партийное мнение": "closed_1",
-        "Альтернативное мнение": "closed_2",
-        "Показатели АГП (Уровень)": "closed_3",
-        "Показатели АГП (Качество)": "closed_4",
-        "Экономическая привлекательность": "closed_5",
-        "деятельность ветеранов СВО": "closed_7",
-        "Участие в проекте  ЛО": "closed_8",  # Note: sheet name has extra spaces
-        # PENALTY
-        "Конфликты с региональной  ВЛ": "pen_1",  # Note: sheet name has extra spaces
-        "Внутримуниципальные конфликты": "pen_2",
-        "Данные правоохранительных орган": "pen_3",
-    }
+def shutdown_sheet_pool():
+    """Stop the sheet worker processes (app shutdown)"""
+    global _sheet_pool
+    with _sheet_pool_lock:
+        if _sheet_pool is not None:
+            _sheet_pool.shutdown(cancel_futures=True)
+            _sheet_pool = None
+
+
+def _process_multisheet_format(source, wb, sheet_names, db, period_id, version_id, official_indicators):
+    """Process multi-sheet Excel format (one sheet per indicator with raw data)"""
 
     # Build mapping from sheet name to indicator code
     sheet_to_code = {}
     for sheet_name in sheet_names:
-        if sheet_name in criterion_name_to_code:
-            sheet_to_code[sheet_name] = criterion_name_to_code[sheet_name]
-            logger.info(f"Sheet '{sheet_name}' -> {criterion_name_to_code[sheet_name]} (exact match)")
+        code, match_kind = _match_sheet_code(sheet_name)
+        if code:
+            sheet_to_code[sheet_name] = code
+            logger.info(f"Sheet '{sheet_name}' -> {code} ({match_kind})")
         else:
-            # Try partial match
-            matched = False
-            for criterion_name, code in criterion_name_to_code.items():
-                if criterion_name.lower() in sheet_name.lower() or sheet_name.lower() in criterion_name.lower():
-                    sheet_to_code[sheet_name] = code
-                    logger.info(f"Sheet '{sheet_name}' -> {code} (partial match)")
-                    matched = True
-                    break
-
-            if not matched:
-                logger.warning(f"Sheet '{sheet_name}' -> NO MATCH")
+            logger.warning(f"Sheet '{sheet_name}' -> NO MATCH")
 
-    values_loaded = 0
-    total_rows_processed = 0
+    mo_lookup, ind_lookup = _load_import_lookups(db, official_indicators)
 
-    # Process each sheet
+    # Sheets to score, in workbook order
+    tasks = []
     for sheet_name in sheet_names:
         if sheet_name not in sheet_to_code:
             logger.info(f"Skipping sheet '{sheet_name}' - no matching criterion code")
             continue
 
         indicator_code = sheet_to_code[sheet_name]
-        logger.info(f"Processing sheet '{sheet_name}' as criterion '{indicator_code}'")
-
-        # Read with proper header handling (use row 0 as header)
-        df = pd.read_excel(io.BytesIO(content), sheet_name=sheet_name, header=0)
-        logger.info(f"Sheet '{sheet_name}': {df.shape} - columns: {list(df.columns)}")
-        logger.debug(f"First row sample data:")
-        if len(df) > 0:
-            logger.debug(f"  {df.iloc[0].to_dict()}")
-
-        # Find municipality column (first column usually contains MO names)
-        mo_col_name = None
-        # Try to find by name first
-        for col in df.columns:
-            if 'муниципалитет' in str(col).lower() or col == df.columns[0]:
-                mo_col_name = col
-                break
-
-        # If not found by name, use first column
-        if not mo_col_name:
-            mo_col_name = df.columns[0]
-            logger.info(f"Using first column as municipality: '{mo_col_name}'")
-
-        if mo_col_name is None:
-            logger.warning(f"No municipality column found in sheet '{sheet_name}'")
-            continue
-
-        # Find indicator in database
-        indicator = db.query(DimIndicator).filter(
-            DimIndicator.code == indicator_code
-        ).first()
+        indicator = ind_lookup.get(indicator_code)
 
         if not indicator:
             logger.warning(f"Indicator {indicator_code} not found in database")
             continue
 
-        # Load data from this sheet
-        for idx, row in df.iterrows():
-            mo_name = row.get(mo_col_name)
-            if pd.isna(mo_name) or mo_name == '':
-                continue
+        tasks.append((sheet_name, indicator_code, indicator))
 
-            total_rows_processed += 1
+    # Sheets are independent, so parsing + scoring runs in worker processes;
+    # map() keeps results in workbook order (later sheets win on duplicate codes, as before)
+    if len(tasks) > 1 and MULTISHEET_MAX_WORKERS > 1:
+        # Workers reopen the workbook from bytes (zipfile seeks before each read, so the
+        # open read-only workbook is unaffected)
+        source.seek(0)
+        content = source.read()
+        try:
+            sheet_results = list(_get_sheet_pool().map(
+                _score_sheet_in_worker,
+                repeat(content),
+                [sheet_name for sheet_name, _, _ in tasks],
+                [indicator_code for _, indicator_code, _ in tasks],
+            ))
+        except BrokenProcessPool as e:
+            # A dead worker breaks the pool for good: drop it (the next import starts a
+            # fresh one) and score this workbook in-process
+            logger.warning(f"⚠️ Sheet worker pool broken ({e}), scoring sheets in-process")
+            shutdown_sheet_pool()
+            sheet_results = [_score_sheet(wb[sheet_name], indicator_code) for sheet_name, indicator_code, _ in tasks]
+    else:
+        sheet_results = [_score_sheet(wb[sheet_name], indicator_code) for sheet_name, indicator_code, _ in tasks]
 
-            # Find MO
-            mo = db.query(DimMO).filter(
-                text("mo_name ILIKE :name")
-            ).params(name=f"%{mo_name}%").first()
+    values_loaded = 0
+    total_rows_processed = 0
+    facts = []
+    # The same municipality names repeat on every sheet; match each distinct name once
+    match_mo = _mo_matcher(mo_lookup)
 
-            if not mo:
-                logger.warning(f"Municipality '{mo_name}' not found")
-                continue
+    for (sheet_name, indicator_code, indicator), scored_rows in zip(tasks, sheet_results):
+        logger.info(f"Processing sheet '{sheet_name}' as criterion '{indicator_code}': {len(scored_rows)} rows")
 
-            # Use IndicatorScorer to calculate score from raw data
-            logger.debug(f"Scoring {indicator_code} for {mo_name}")
-            row_data = df.iloc[idx]
-            logger.debug(f"  Row data: {row_data.to_dict()}")
-            value_float = IndicatorScorer.score_indicator(indicator_code, row_data)
+        for mo_name, value_float in scored_rows:
+            total_rows_processed += 1
 
-            if value_float is None:
-                logger.warning(f"Could not score {indicator_code} for {mo_name}, skipping")
+            # Find MO
+            mo = match_mo(mo_name)
+            if not mo:
                 continue
 
-            logger.info(f"Scored {indicator_code}={value_float} for {mo_name}")
+            logger.debug(f"Scored {indicator_code}={value_float} for {mo_name}")
 
             # Insert or update
-            existing = db.query(FactIndicator).filter(
-                FactIndicator.mo_id == mo.mo_id,
-                FactIndicator.period_id == period.period_id,
-                FactIndicator.ind_id == indicator.ind_id,
-                FactIndicator.version_id == methodology.version_id
-            ).first()
-
-            if existing:
-                existing.score = value_float
-            else:
-                fact = FactIndicator(
-                    mo_id=mo.mo_id,
-                    period_id=period.period_id,
-                    ind_id=indicator.ind_id,
-                    version_id=methodology.version_id,
-                    score=value_float,
-                )
-                db.add(fact)
+            facts.append({
+                "mo_id": mo.mo_id,
+                "period_id": period_id,
+                "ind_id": indicator.ind_id,
+                "version_id": version_id,
+                "score": value_float,
+            })
 
             values_loaded += 1
 
-    return values_loaded, total_rows_processed
+    _write_facts(db, facts)
 
+    return values_loaded, total_rows_processed
 
-def _process_singlesheet_format(content, xls, sheet_names, db, period, methodology, official_indicators):
-    """Process single-sheet Excel format (pre-calculated scores)"""
-    df = pd.read_excel(io.BytesIO(content), sheet_name=sheet_names[0])
-    logger.info(f"Single-sheet format: {df.shape}")
-
-    values_loaded = 0
-    rows_processed = 0
 
-    for idx, row in df.iterrows():
-        mo_name = None
-        for col in df.columns:
-            if 'муниципалитет' in str(col).lower():
-                mo_name = row.get(col)
-                break
+def _score_sheet(ws, indicator_code):
+    """
+    Score every row of one criterion sheet with IndicatorScorer (no database access).
 
-        if pd.isna(mo_name) or mo_name == '':
-            continue
+    Returns [(mo_name, score)] for rows that have a municipality name; rows
+    IndicatorScorer couldn't score get 0.0 (same as score_indicator).
+    """
+    # First row is the header
+    columns, records = _iter_sheet_records(ws)
+    logger.info(f"Sheet '{ws.title}': columns: {columns}")
 
-        rows_processed += 1
+    # Municipality names are in the first column
+    if not columns:
+        logger.warning(f"No municipality column found in sheet '{ws.title}'")
+        return []
+    mo_col_name = columns[0]
 
-        mo = db.query(DimMO).filter(
-            text("mo_name ILIKE :name")
-        ).params(name=f"%{mo_name}%").first()
+    records = [record for record in records if record[mo_col_name] not in (None, '')]
 
-        if not mo:
-            continue
+    # One scorer call per sheet instead of one per row
+    scores = IndicatorScorer.score_batch(indicator_code, records)
+    return [(record[mo_col_name], float(score)) for record, score in zip(records, scores)]
 
-        for col in df.columns:
-            col_str = str(col).strip()
 
-            matched_code = None
-            for official_code in official_indicators:
-                if col_str == official_code or col_str.lower() == official_code:
-                    matched_code = official_code
-                    break
+def _score_sheet_in_worker(content, sheet_name, indicator_code):
+    """Process pool entry point: open the workbook in the worker and score one sheet"""
+    wb = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        return _score_sheet(wb[sheet_name], indicator_code)
+    finally:
+        wb.close()
 
-            if not matched_code:
-                continue
 
-            value = row.get(col)
-            if pd.isna(value) or value == '':
-                continue
+def _process_singlesheet_format(wb, sheet_names, db, period_id, version_id, official_indicators):
+    """Process single-sheet Excel format (pre-calculated scores)"""
+    df = _sheet_frame(wb[sheet_names[0]])
+    logger.info(f"Single-sheet format: {df.shape}")
 
-            indicator = db.query(DimIndicator).filter(
-                DimIndicator.code == matched_code
-            ).first()
+    mo_lookup, ind_lookup = _load_import_lookups(db, official_indicators)
+    facts = []
 
-            if not indicator:
-                continue
+    mo_col = next((col for col in df.columns if 'муниципалитет' in str(col).lower()), None)
+    if mo_col is None:
+        return 0, 0
 
-            try:
-                if isinstance(value, str):
-                    value_clean = value.replace('%', '').replace(' ', '').replace(',', '.')
-                    value_float = float(value_clean)
-                else:
-                    value_float = float(value)
-            except:
-                continue
+    names = df[mo_col]
+    rows_processed = int((names.notna() & (names != '')).sum())
 
-            existing = db.query(FactIndicator).filter(
-                FactIndicator.mo_id == mo.mo_id,
-                FactIndicator.period_id == period.period_id,
-                FactIndicator.ind_id == indicator.ind_id,
-                FactIndicator.version_id == methodology.version_id
-            ).first()
-
-            if existing:
-                existing.score = value_float
-            else:
-                fact = FactIndicator(
-                    mo_id=mo.mo_id,
-                    period_id=period.period_id,
-                    ind_id=indicator.ind_id,
-                    version_id=methodology.version_id,
-                    score=value_float,
-                )
-                db.add(fact)
+    # Wide sheet -> (municipality, indicator column, value); empty and unparseable cells are dropped
+    # Only columns whose indicator exists are melted, so every long row has one
+    col_to_code = _indicator_columns(df.columns, list(ind_lookup))
+    long = _melt_indicator_values(df, mo_col, list(col_to_code))
+    long_mos = _resolve_mo_column(mo_lookup, long[mo_col])
 
-            values_loaded += 1
+    for (mo_name, column, value_float), mo in zip(long.itertuples(index=False, name=None), long_mos):
+        if not mo:
+            continue
 
-    return values_loaded, rows_processed
+        indicator = ind_lookup[col_to_code[column]]
+
+        facts.append({
+            "mo_id": mo.mo_id,
+            "period_id": period_id,
+            "ind_id": indicator.ind_id,
+            "version_id": version_id,
+            "score": value_float,
+        })
+
+    _write_facts(db, facts)
+
+    return len(facts), rows_processed
+
+
+def _yes_no_score(rules, column, value):
+    """First (column keyword, score if 'да', score otherwise) rule whose keyword is in the column"""
+    for keyword, yes_score, no_score in rules:
+        if keyword in column:
+            return yes_score if value == 'да' else no_score
+    return None
+
+
+def _category_score(column_keywords, categories, column, value):
+    """Score a categorical value if the column matches one of the keywords"""
+    if any(keyword in column for keyword in column_keywords):
+        return categories.get(value)
+    return None
+
+
+# Данные правоохранительных органов (pen_3)
+_LAW_ENFORCEMENT_RULES = (
+    ('возбуждения уголовного дела', -5.0, 1.0),
+    ('проверок силовых структур', -2.0, 1.0),
+    ('публикаций', -1.0, 1.0),
+)
+# Конфликты с региональной властью (pen_1); 'публичного' also covers 'публичного конфликта'
+_REGIONAL_CONFLICT_RULES = (
+    ('публичного', -3.0, 1.0),
+    ('конфликта с профильным', -2.0, 1.0),
+)
+# Работа с грантами (pub_9)
+_GRANTS_RULES = (
+    ('нарушений', 0.0, 1.0),
+)
+# Оценка поддержки руководства (pub_1); 'заместителем' also covers 'первым заместителем'
+_LEADERSHIP_SUPPORT_RULES = (
+    ('публичной', 3.0, 0.0),
+    ('заместителем', 2.0, 0.0),
+    ('ключевых', 1.0, 0.0),
+)
+# Экономическая привлекательность (closed_5)
+_ATTRACTIVENESS_SCORES = {'высокая': 3.0, 'средняя': 2.0, 'слабая': 1.0, 'низкая': 1.0}
+# Показатели АГП (Качество) (closed_4)
+_AGP_QUALITY_SCORES = {'превышает': 5.0, 'достигнут': 3.0, 'не достигнут': 0.0, 'не выполнен': 0.0}
+# Показатели АГП (Уровень) (closed_3)
+_AGP_LEVEL_SCORES = {'превысил': 5.0, 'выполнен': 3.0, 'не выполнен': 0.0, 'не достигнут': 0.0}
+_MUNICIPAL_CONFLICT_YES = frozenset(['от 1 и более', '1 и более', 'да'])
+
+
+def _score_municipal_conflicts(column, value):
+    """Внутримуниципальные конфликты (pen_2)"""
+    if 'значительного публичного конфликта' in column:
+        return -2.0 if value == 'да' else 1.0
+    if 'конфликтов' in column:
+        # Try to parse as number for count-based scoring
+        count = _parse_number(value.replace('и более', '').replace('+', '').strip())
+        if count is None:
+            return -2.0 if value in _MUNICIPAL_CONFLICT_YES else 1.0
+        if count >= 1 and 'квартал' in column:
+            return -3.0
+        elif count >= 1:
+            return -2.0
+        return 1.0
+    return None
+
+
+def _score_positioning(column, value):
+    """Позиционирование главы МО (pub_3)"""
+    if 'позиционирование' in column or 'тип' in column:
+        if 'функционер' in value or 'хозяйственник' in value:
+            return 3.0
+        elif 'размытое' in value or 'некачественное' in value or 'размытая' in value:
+            return 0.0
+    return None
+
+
+def _score_agp_tasks(column, value):
+    """Выполнение задач АГП (pub_2) - usually numeric percentage, normalized to 0-10 scale"""
+    percent = _parse_number(value.replace('%', '').strip())
+    return percent / 10.0 if percent is not None else None
+
+
+# (sheet keywords that must all be present, handler(column, value)), checked in order.
+# Sheet and column names are lowercased once per call before dispatch.
+TEXT_SCORE_RULES = (
+    (('правоохранительных',), lambda c, v: _yes_no_score(_LAW_ENFORCEMENT_RULES, c, v)),
+    (('внутримуниципальные конфликты',), _score_municipal_conflicts),
+    (('конфликты с региональной',), lambda c, v: _yes_no_score(_REGIONAL_CONFLICT_RULES, c, v)),
+    (('грантами',), lambda c, v: _yes_no_score(_GRANTS_RULES, c, v)),
+    (('экономическая привлекательность',),
+     lambda c, v: _category_score(('уровень привлекательности',), _ATTRACTIVENESS_SCORES, c, v)),
+    (('показатели агп', 'качество'),
+     lambda c, v: _category_score(('качеству', 'качество'), _AGP_QUALITY_SCORES, c, v)),
+    (('показатели агп', 'уровень'),
+     lambda c, v: _category_score(('уровню', 'уровень'), _AGP_LEVEL_SCORES, c, v)),
+    (('позиционирование',), _score_positioning),
+    (('оценка поддержки',), lambda c, v: _yes_no_score(_LEADERSHIP_SUPPORT_RULES, c, v)),
+    (('выполнение задач',), _score_agp_tasks),
+    (('выполнения задач',), _score_agp_tasks),
+)
 
 
 def convert_text_to_score(sheet_name: str, column_name: str, value: str, row: dict) -> float:
     """
     Convert text values to numeric scores based on sheet-specific rules.
-    Each sheet has different scoring logic.
+    Each sheet has different scoring logic (see TEXT_SCORE_RULES).
     Falls back to numeric if text-based rules don't match.
     """
     if value is None or (isinstance(value, str) and value.strip() == ''):
@@ -532,115 +1059,18 @@ def convert_text_to_score(sheet_name: str, column_name: str, value: str, row: di
     value_clean = str(value).strip().lower()
 
     # Try to parse as number first (handles most cases)
-    try:
-        # Remove common formatting characters
-        numeric_val = value_clean.replace('%', '').replace(' ', '').replace(',', '.')
-        if numeric_val:
-            return float(numeric_val)
-    except:
-        pass
+    numeric_val = _parse_number(_clean_number_text(value_clean))
+    if numeric_val is not None:
+        return numeric_val
 
     # SPECIAL RULES FOR CATEGORICAL DATA (text-based)
-
-    # Данные правоохранительных органов (pen_3)
-    if 'правоохранительных' in sheet_name.lower():
-        if 'возбуждения уголовного дела' in column_name.lower():
-            return -5.0 if value_clean == 'да' else 1.0
-        elif 'проверок силовых структур' in column_name.lower():
-            return -2.0 if value_clean == 'да' else 1.0
-        elif 'публикаций' in column_name.lower():
-            return -1.0 if value_clean == 'да' else 1.0
-
-    # Внутримуниципальные конфликты (pen_2)
-    if 'внутримуниципальные конфликты' in sheet_name.lower():
-        if 'значительного публичного конфликта' in column_name.lower():
-            return -2.0 if value_clean == 'да' else 1.0
-        elif 'конфликтов' in column_name.lower():
-            # Try to parse as number for count-based scoring
-            try:
-                count = int(float(value_clean.replace('и более', '').replace('+', '').strip()))
-                if count >= 1 and 'квартал' in column_name.lower():
-                    return -3.0
-                elif count >= 1:
-                    return -2.0
-                else:
-                    return 1.0
-            except:
-                return -2.0 if value_clean in ['от 1 и более', '1 и более', 'да'] else 1.0
-
-    # Конфликты с региональной властью (pen_1)
-    if 'конфликты с региональной' in sheet_name.lower():
-        if 'публичного конфликта' in column_name.lower() or 'публичного' in column_name.lower():
-            return -3.0 if value_clean == 'да' else 1.0
-        elif 'конфликта с профильным' in column_name.lower():
-            return -2.0 if value_clean == 'да' else 1.0
-
-    # Работа с грантами (pub_9)
-    if 'грантами' in sheet_name.lower():
-        if 'нарушений' in column_name.lower():
-            return 0.0 if value_clean == 'да' else 1.0
-
-    # Экономическая привлекательность (closed_5)
-    if 'экономическая привлекательность' in sheet_name.lower():
-        if 'уровень привлекательности' in column_name.lower():
-            if value_clean == 'высокая':
-                return 3.0
-            elif value_clean == 'средняя':
-                return 2.0
-            elif value_clean in ['слабая', 'низкая']:
-                return 1.0
-
-    # Показатели АГП (Качество) (closed_4)
-    if 'показатели агп' in sheet_name.lower() and 'качество' in sheet_name.lower():
-        if 'качеству' in column_name.lower() or 'качество' in column_name.lower():
-            if value_clean == 'превышает':
-                return 5.0
-            elif value_clean == 'достигнут':
-                return 3.0
-            elif value_clean in ['не достигнут', 'не выполнен']:
-                return 0.0
-
-    # Показатели АГП (Уровень) (closed_3)
-    if 'показатели агп' in sheet_name.lower() and 'уровень' in sheet_name.lower():
-        if 'уровню' in column_name.lower() or 'уровень' in column_name.lower():
-            if value_clean == 'превысил':
-                return 5.0
-            elif value_clean == 'выполнен':
-                return 3.0
-            elif value_clean in ['не выполнен', 'не достигнут']:
-                return 0.0
-
-    # Позиционирование главы МО (pub_3)
-    if 'позиционирование' in sheet_name.lower():
-        if 'позиционирование' in column_name.lower() or 'тип' in column_name.lower():
-            if 'функционер' in value_clean or 'хозяйственник' in value_clean:
-                return 3.0
-            elif 'размытое' in value_clean or 'некачественное' in value_clean or 'размытая' in value_clean:
-                return 0.0
-
-    # Оценка поддержки руководства (pub_1)
-    if 'оценка поддержки' in sheet_name.lower():
-        if 'публичной' in column_name.lower():
-            return 3.0 if value_clean == 'да' else 0.0
-        elif 'заместителем' in column_name.lower() or 'первым заместителем' in column_name.lower():
-            return 2.0 if value_clean == 'да' else 0.0
-        elif 'ключевых' in column_name.lower():
-            return 1.0 if value_clean == 'да' else 0.0
-
-    # Выполнение задач АГП (pub_2) - usually numeric percentage
-    if 'выполнение задач' in sheet_name.lower() or 'выполнения задач' in sheet_name.lower():
-        try:
-            return float(value_clean.replace('%', '').strip()) / 10.0  # Normalize percentage to 0-10 scale
-        except:
-            pass
-
-    # If nothing matches, try numeric conversion as fallback
-    try:
-        numeric_val = value_clean.replace('%', '').replace(' ', '').replace(',', '.')
-        if numeric_val:
-            return float(numeric_val)
-    except:
-        pass
+    sheet_lower = sheet_name.lower()
+    column_lower = column_name.lower()
+    for sheet_keywords, handler in TEXT_SCORE_RULES:
+        if all(keyword in sheet_lower for keyword in sheet_keywords):
+            score = handler(column_lower, value_clean)
+            if score is not None:
+                return score
 
     # Default: return 0.0 instead of None to avoid skipping the row
     return 0.0
@@ -672,12 +1102,9 @@ async def import_official_methodology_csv_deprecated(
 
     try:
         # Read CSV file
-        content = await file.read()
-        df = pd.read_csv(io.BytesIO(content), encoding='utf-8')
-
-        logger.info(f"CSV uploaded: {len(df)} rows, {len(df.columns)} columns")
+        upload = file.file
+        upload.seek(0)
         logger.info(f"Target period: {period_month}")
-        logger.info(f"Columns: {list(df.columns)}")
 
         # Parse period_month
         from datetime import datetime, timedelta
@@ -699,8 +1126,8 @@ async def import_official_methodology_csv_deprecated(
         implement_official_methodology()
 
         # Get or create official methodology version
-        methodology = db.query(DimMethodology).first()
-        if not methodology:
+        version_id = _cached_methodology_id(db)
+        if version_id is None:
             methodology = DimMethodology(
                 version="Official v1",
                 valid_from="2024-01-01",
@@ -709,14 +1136,12 @@ async def import_official_methodology_csv_deprecated(
             db.add(methodology)
             db.commit()
             db.refresh(methodology)
-            logger.info(f"Created official methodology (ID: {methodology.version_id})")
+            version_id = methodology.version_id
+            logger.info(f"Created official methodology (ID: {version_id})")
 
         # Get or create period
-        period = db.query(DimPeriod).filter(
-            DimPeriod.date_from == date_from
-        ).first()
-
-        if not period:
+        period_id = _cached_period_id(db, date_from)
+        if period_id is None:
             period = DimPeriod(
                 period_type="month",
                 date_from=date_from,
@@ -726,7 +1151,8 @@ async def import_official_methodology_csv_deprecated(
             db.add(period)
             db.commit()
             db.refresh(period)
-            logger.info(f"Created period {period_month} (ID: {period.period_id})")
+            period_id = period.period_id
+            logger.info(f"Created period {period_month} (ID: {period_id})")
 
         # Official indicator codes
         official_indicators = [
@@ -736,89 +1162,20 @@ async def import_official_methodology_csv_deprecated(
         ]
 
         # Load data
-        values_loaded = 0
-        errors = 0
-        rows_processed = 0
-
-        for _, row in df.iterrows():
-            mo_name = row.get('Муниципалитет') or row.get('municipalitet') or row.get('mo_name')
-
-            if pd.isna(mo_name) or mo_name == '':
-                continue
-
-            rows_processed += 1
-
-            # Find MO by name
-            mo = db.query(DimMO).filter(
-                text("mo_name ILIKE :name")
-            ).params(name=f"%{mo_name}%").first()
-
-            if not mo:
-                logger.warning(f"Municipality not found: {mo_name}")
-                continue
-
-            # Load official indicators
-            for ind_code in official_indicators:
-                # Check if column exists in CSV
-                if ind_code not in row:
-                    continue
-
-                value = row[ind_code]
-                if pd.isna(value) or value == '':
-                    continue
-
-                # Find indicator
-                indicator = db.query(DimIndicator).filter(
-                    DimIndicator.code == ind_code
-                ).first()
-
-                if not indicator:
-                    logger.warning(f"Indicator not found: {ind_code}")
-                    continue
-
-                # Convert value to float
-                try:
-                    if isinstance(value, str):
-                        value_clean = value.replace('%', '').replace(' ', '').replace(',', '.')
-                        try:
-                            value_float = float(value_clean)
-                        except:
-                            value_float = 0.0
-                    else:
-                        value_float = float(value)
-                except:
-                    value_float = 0.0
-
-                # Check if exists
-                existing = db.query(FactIndicator).filter(
-                    FactIndicator.mo_id == mo.mo_id,
-                    FactIndicator.period_id == period.period_id,
-                    FactIndicator.ind_id == indicator.ind_id,
-                    FactIndicator.version_id == methodology.version_id
-                ).first()
-
-                if existing:
-                    existing.score = value_float
-                else:
-                    fact = FactIndicator(
-                        mo_id=mo.mo_id,
-                        period_id=period.period_id,
-                        ind_id=indicator.ind_id,
-                        version_id=methodology.version_id,
-                        score=value_float,
-                    )
-                    db.add(fact)
-
-                values_loaded += 1
-
+        result = _process_official_methodology_csv(upload, db, period_id, version_id, official_indicators)
+        rows_processed = result["rows_processed"]
+        values_loaded = result["values_loaded"]
+        # Снапшоты рейтинга периода устарели: до пересчёта страница строит деревья вживую
+        from migrations import clear_fact_summary_snapshots
+        clear_fact_summary_snapshots(db, period_id)
         db.commit()
         logger.info(f"Loaded {values_loaded} indicator values from {rows_processed} rows")
 
         # Automatically calculate aggregated scores
-        logger.info(f"Auto-calculating aggregated scores for period {period.period_id}...")
+        logger.info(f"Auto-calculating aggregated scores for period {period_id}...")
         try:
             from migrations import calculate_fact_summary_from_indicators
-            calculate_fact_summary_from_indicators()
+            calculate_fact_summary_from_indicators(period_id=period_id)
             logger.info("✓ Aggregated scores calculated successfully")
         except Exception as e:
             logger.error(f"Error calculating aggregated scores: {e}")
@@ -830,7 +1187,7 @@ async def import_official_methodology_csv_deprecated(
                 "rows_processed": rows_processed,
                 "values_loaded": values_loaded,
                 "period": period_month,
-                "period_id": period.period_id,
+                "period_id": period_id,
                 "methodology": "Official 16 criteria"
             },
             "next_steps": [
@@ -870,13 +1227,14 @@ async def import_official_methodology_excel_deprecated(
     )
 
     try:
-        # Read Excel file
-        content = await file.read()
-        logger.info(f"🔹 Received file: {file.filename}, size: {len(content)} bytes")
-
-        # Get all sheet names
-        xls = pd.ExcelFile(io.BytesIO(content))
-        sheet_names = xls.sheet_names
+        # Read Excel file straight from the spooled upload
+        upload = file.file
+        upload.seek(0)
+        logger.info(f"🔹 Received file: {file.filename}, size: {file.size} bytes")
+
+        # Open the workbook once in streaming mode; sheets below are read row by row
+        wb = openpyxl.load_workbook(upload, read_only=True, data_only=True)
+        sheet_names = wb.sheetnames
         logger.info(f"Excel file has {len(sheet_names)} sheets")
         for i, sn in enumerate(sheet_names):
             logger.info(f"  Sheet {i+1}: '{sn}'")
@@ -888,7 +1246,7 @@ async def import_official_methodology_excel_deprecated(
                 "status": "error",
                 "message": "Excel file has no sheets",
                 "debug": {
-                    "file_size": len(content),
+                    "file_size": file.size,
                     "sheets_found": 0
                 }
             }
@@ -907,30 +1265,26 @@ async def import_official_methodology_excel_deprecated(
         date_from = period_date.strftime("%Y-%m-%d")
         date_to = period_end.strftime("%Y-%m-%d")
 
-        # Ensure official methodology exists
-        logger.info("Ensuring official methodology exists...")
-        from migrations import implement_official_methodology
-        implement_official_methodology()
+        # Official methodology (indicators, columns) is set up once at startup by run_all_migrations().
+        # Everything below runs in one transaction: new methodology/period rows are only
+        # flushed, and the single commit after the fact upsert makes the import atomic.
 
         # Get or create official methodology version
-        methodology = db.query(DimMethodology).first()
-        if not methodology:
+        version_id = _cached_methodology_id(db)
+        if version_id is None:
             methodology = DimMethodology(
                 version="Official v1",
                 valid_from="2024-01-01",
                 notes="Official methodology with 16 criteria"
             )
             db.add(methodology)
-            db.commit()
-            db.refresh(methodology)
-            logger.info(f"Created official methodology (ID: {methodology.version_id})")
+            db.flush()
+            version_id = methodology.version_id
+            logger.info(f"Created official methodology (ID: {version_id})")
 
         # Get or create period
-        period = db.query(DimPeriod).filter(
-            DimPeriod.date_from == date_from
-        ).first()
-
-        if not period:
+        period_id = _cached_period_id(db, date_from)
+        if period_id is None:
             period = DimPeriod(
                 period_type="month",
                 date_from=date_from,
@@ -938,9 +1292,9 @@ async def import_official_methodology_excel_deprecated(
                 edg_flag=False
             )
             db.add(period)
-            db.commit()
-            db.refresh(period)
-            logger.info(f"Created period {period_month} (ID: {period.period_id})")
+            db.flush()
+            period_id = period.period_id
+            logger.info(f"Created period {period_month} (ID: {period_id})")
 
         # Official indicator codes
         official_indicators = [
@@ -956,6 +1310,8 @@ async def import_official_methodology_excel_deprecated(
         values_loaded = 0
         total_rows_processed = 0
         sheet_to_code = {}  # Initialize mapping outside the if block
+        mo_lookup, ind_lookup = _load_import_lookups(db, official_indicators)
+        facts = []
 
         # For multi-sheet format, check if sheets match criterion names
         has_multiple_sheets = len(sheet_names) > 1
@@ -964,13 +1320,7 @@ async def import_official_methodology_excel_deprecated(
         is_multisheet_format = False
         if has_multiple_sheets:
             # Check if sheet names contain known criterion keywords
-            criterion_keywords = [
-                'выполнение', 'позиционирование', 'проектная', 'молодежи', 'ветеран',
-                'кадровый', 'гранты', 'партийная', 'мандатов', 'показатели', 'экономическ',
-                'конфликты', 'правоохранительных'
-            ]
-            matching_sheets = sum(1 for sheet in sheet_names
-                                if any(kw in sheet.lower() for kw in criterion_keywords))
+            matching_sheets = _count_criterion_sheets(sheet_names)
             is_multisheet_format = matching_sheets >= 10  # If 10+ sheets have criterion names
             logger.info(f"🔹 Multi-sheet detection: {matching_sheets}/{len(sheet_names)} sheets match criterion names")
 
@@ -1009,38 +1359,35 @@ async def import_official_methodology_excel_deprecated(
                 "Данные правоохранительных орган": "pen_3",
             }
 
-            # Build mapping from sheet name to official code
+            # Build mapping from sheet name to official code (exact match first, then partial)
+            match_sheet = _sheet_code_matcher(criterion_name_to_code)
             sheet_to_code = {}
             for sheet_name in sheet_names:
-                # Try exact match first
-                if sheet_name in criterion_name_to_code:
-                    sheet_to_code[sheet_name] = criterion_name_to_code[sheet_name]
-                    logger.info(f"Sheet '{sheet_name}' -> {criterion_name_to_code[sheet_name]} (exact match)")
+                code, match_kind = match_sheet(sheet_name)
+                if code:
+                    sheet_to_code[sheet_name] = code
+                    logger.info(f"Sheet '{sheet_name}' -> {code} ({match_kind})")
                 else:
-                    # Try partial match
-                    matched = False
-                    for criterion_name, code in criterion_name_to_code.items():
-                        if criterion_name.lower() in sheet_name.lower() or sheet_name.lower() in criterion_name.lower():
-                            sheet_to_code[sheet_name] = code
-                            logger.info(f"Sheet '{sheet_name}' -> {code} (partial match: '{criterion_name}')")
-                            matched = True
-                            break
-
-                    if not matched:
-                        logger.warning(f"Sheet '{sheet_name}' -> NO MATCH")
+                    logger.warning(f"Sheet '{sheet_name}' -> NO MATCH")
 
             logger.info(f"Final sheet to code mapping: {sheet_to_code}")
 
+            # Read every criterion sheet in one pass over the workbook ({sheet_name: df},
+            # like read_excel(sheet_name=None)); unmatched sheets are never parsed
+            sheets = {sheet_name: _sheet_frame(wb[sheet_name]) for sheet_name in sheet_to_code}
+
+            match_mo = _mo_matcher(mo_lookup)
+
             # Process each sheet as a separate criterion
             for sheet_name in sheet_names:
-                if sheet_name not in sheet_to_code:
+                if sheet_name not in sheets:
                     logger.info(f"Skipping sheet '{sheet_name}' - no matching criterion code")
                     continue
 
                 indicator_code = sheet_to_code[sheet_name]
                 logger.info(f"Processing sheet '{sheet_name}' as criterion '{indicator_code}'")
 
-                df = pd.read_excel(io.BytesIO(content), sheet_name=sheet_name)
+                df = sheets[sheet_name]
                 logger.info(f"Sheet '{sheet_name}': {df.shape} - columns: {list(df.columns)}")
 
                 # Find municipality column
@@ -1055,28 +1402,11 @@ async def import_official_methodology_excel_deprecated(
                     continue
 
                 # Find value column (usually second column or numeric column)
-                value_col_name = None
-
-                # Try to find a numeric column by checking a larger sample
-                for col in df.columns:
-                    if col != mo_col_name and 'глава' not in str(col).lower():  # Skip "Глава МО" column
-                        # Check if column contains numeric values by testing multiple rows
-                        try:
-                            sample = pd.to_numeric(df[col].dropna().head(10), errors='coerce')
-                            numeric_count = sample.notna().sum()
-                            total_count = len(sample)
-
-                            # If at least 50% of values are numeric, use this column
-                            if total_count > 0 and numeric_count / total_count >= 0.5:
-                                value_col_name = col
-                                logger.debug(f"Found numeric column '{col}' with {numeric_count}/{total_count} numeric values")
-                                break
-                        except:
-                            pass
+                non_mo_cols = [col for col in df.columns if col != mo_col_name and 'глава' not in str(col).lower()]  # Skip "Глава МО" column
+                value_col_name = _first_numeric_column(df, non_mo_cols)
 
                 # If still no numeric column found, use the second non-municipality column
                 if not value_col_name:
-                    non_mo_cols = [col for col in df.columns if col != mo_col_name and 'глава' not in str(col).lower()]
                     if non_mo_cols:
                         value_col_name = non_mo_cols[0]
                         logger.info(f"No purely numeric column found, using first available column: '{value_col_name}'")
@@ -1087,62 +1417,38 @@ async def import_official_methodology_excel_deprecated(
                 logger.info(f"Using columns: MO='{mo_col_name}', Value='{value_col_name}'")
 
                 # Get or create indicator
-                indicator = db.query(DimIndicator).filter(
-                    DimIndicator.code == indicator_code
-                ).first()
+                indicator = ind_lookup.get(indicator_code)
 
                 if not indicator:
                     logger.warning(f"Indicator {indicator_code} not found in database")
                     continue
 
-                # Load data from this sheet
-                for idx, row in df.iterrows():
-                    mo_name = row.get(mo_col_name)
-                    if pd.isna(mo_name) or mo_name == '':
-                        continue
+                # Load data from this sheet; score all municipality rows in one batch
+                records = [record for record in df.to_dict('records')
+                           if not (pd.isna(record[mo_col_name]) or record[mo_col_name] == '')]
+                scores = IndicatorScorer.score_batch(indicator_code, records)
+
+                for record, value_float in zip(records, scores.tolist()):
+                    mo_name = record[mo_col_name]
 
                     total_rows_processed += 1
 
                     # Find MO
-                    mo = db.query(DimMO).filter(
-                        text("mo_name ILIKE :name")
-                    ).params(name=f"%{mo_name}%").first()
-
+                    mo = match_mo(mo_name)
                     if not mo:
-                        logger.warning(f"Municipality '{mo_name}' not found")
-                        continue
-
-                    # Get value (use entire row for multi-column scoring)
-                    # Use IndicatorScorer for official methodology
-                    logger.debug(f"Scoring {indicator_code} for {mo_name}, row has columns: {list(df.columns)}")
-                    value_float = IndicatorScorer.score_indicator(indicator_code, df.iloc[idx])
-
-                    if value_float is None:
-                        logger.warning(f"IndicatorScorer returned None for {indicator_code} in sheet '{sheet_name}', skipping this indicator for {mo_name}")
                         continue
 
                     # Successfully scored with IndicatorScorer
-                    logger.info(f"Successfully scored {indicator_code}={value_float} for {mo_name}")
+                    logger.debug(f"Successfully scored {indicator_code}={value_float} for {mo_name}")
 
                     # Insert or update
-                    existing = db.query(FactIndicator).filter(
-                        FactIndicator.mo_id == mo.mo_id,
-                        FactIndicator.period_id == period.period_id,
-                        FactIndicator.ind_id == indicator.ind_id,
-                        FactIndicator.version_id == methodology.version_id
-                    ).first()
-
-                    if existing:
-                        existing.score = value_float
-                    else:
-                        fact = FactIndicator(
-                            mo_id=mo.mo_id,
-                            period_id=period.period_id,
-                            ind_id=indicator.ind_id,
-                            version_id=methodology.version_id,
-                            score=value_float,
-                        )
-                        db.add(fact)
+                    facts.append({
+                        "mo_id": mo.mo_id,
+                        "period_id": period_id,
+                        "ind_id": indicator.ind_id,
+                        "version_id": version_id,
+                        "score": value_float,
+                    })
 
                     values_loaded += 1
 
@@ -1151,88 +1457,46 @@ async def import_official_methodology_excel_deprecated(
             logger.info("Detected Format 1: Single sheet with all columns")
             if has_multiple_sheets:
                 logger.warning(f"⚠️ Multiple sheets detected but not identified as multi-sheet format. Using Format 1 fallback on first sheet only.")
-            df = pd.read_excel(io.BytesIO(content), sheet_name=sheet_names[0])
-
-            for idx, row in df.iterrows():
-                mo_name = None
-                for col in df.columns:
-                    if 'муниципалитет' in str(col).lower():
-                        mo_name = row.get(col)
-                        break
-
-                if pd.isna(mo_name) or mo_name == '':
-                    continue
-
-                total_rows_processed += 1
-
-                mo = db.query(DimMO).filter(
-                    text("mo_name ILIKE :name")
-                ).params(name=f"%{mo_name}%").first()
-
-                if not mo:
-                    continue
-
-                for col in df.columns:
-                    col_str = str(col).strip()
-
-                    matched_code = None
-                    for official_code in official_indicators:
-                        if col_str == official_code or col_str.lower() == official_code:
-                            matched_code = official_code
-                            break
-
-                    if not matched_code:
-                        continue
-
-                    value = row.get(col)
-                    if pd.isna(value) or value == '':
-                        continue
+            df = _sheet_frame(wb[sheet_names[0]])
 
-                    indicator = db.query(DimIndicator).filter(
-                        DimIndicator.code == matched_code
-                    ).first()
+            mo_col = next((col for col in df.columns if 'муниципалитет' in str(col).lower()), None)
+            if mo_col is not None:
+                names = df[mo_col]
+                total_rows_processed += int((names.notna() & (names != '')).sum())
 
-                    if not indicator:
-                        continue
+                # Wide sheet -> (municipality, indicator column, value); unparseable cells are dropped
+                col_to_code = _indicator_columns(df.columns, list(ind_lookup))
+                long = _melt_indicator_values(df, mo_col, list(col_to_code))
+                long_mos = _resolve_mo_column(mo_lookup, long[mo_col])
 
-                    try:
-                        if isinstance(value, str):
-                            value_clean = value.replace('%', '').replace(' ', '').replace(',', '.')
-                            value_float = float(value_clean)
-                        else:
-                            value_float = float(value)
-                    except:
+                for (mo_name, column, value_float), mo in zip(long.itertuples(index=False, name=None), long_mos):
+                    if not mo:
                         continue
 
-                    existing = db.query(FactIndicator).filter(
-                        FactIndicator.mo_id == mo.mo_id,
-                        FactIndicator.period_id == period.period_id,
-                        FactIndicator.ind_id == indicator.ind_id,
-                        FactIndicator.version_id == methodology.version_id
-                    ).first()
+                    indicator = ind_lookup[col_to_code[column]]
 
-                    if existing:
-                        existing.score = value_float
-                    else:
-                        fact = FactIndicator(
-                            mo_id=mo.mo_id,
-                            period_id=period.period_id,
-                            ind_id=indicator.ind_id,
-                            version_id=methodology.version_id,
-                            score=value_float,
-                        )
-                        db.add(fact)
+                    facts.append({
+                        "mo_id": mo.mo_id,
+                        "period_id": period_id,
+                        "ind_id": indicator.ind_id,
+                        "version_id": version_id,
+                        "score": value_float,
+                    })
 
                     values_loaded += 1
 
+        _write_facts(db, facts)
+        # Снапшоты рейтинга периода устарели: до пересчёта страница строит деревья вживую
+        from migrations import clear_fact_summary_snapshots
+        clear_fact_summary_snapshots(db, period_id)
         db.commit()
         logger.info(f"Loaded {values_loaded} indicator values from {total_rows_processed} rows")
 
         # Automatically calculate aggregated scores
-        logger.info(f"Auto-calculating aggregated scores for period {period.period_id}...")
+        logger.info(f"Auto-calculating aggregated scores for period {period_id}...")
         try:
             from migrations import calculate_fact_summary_from_indicators
-            calculate_fact_summary_from_indicators()
+            calculate_fact_summary_from_indicators(period_id=period_id)
             logger.info("Aggregated scores calculated successfully")
         except Exception as e:
             logger.error(f"Error calculating aggregated scores: {e}")
@@ -1248,7 +1512,7 @@ async def import_official_methodology_excel_deprecated(
                 "rows_processed": total_rows_processed,
                 "values_loaded": values_loaded,
                 "period": period_month,
-                "period_id": period.period_id,
+                "period_id": period_id,
                 "methodology": "Official 16 criteria",
                 "total_sheets": len(sheet_names),
                 "format_detected": "Multi-sheet (Format 2)" if is_multisheet_format else "Single-sheet (Format 1)"
@@ -1275,8 +1539,8 @@ async def get_official_methodology_template(db: Session = Depends(get_db)):
     Returns a CSV with municipality names and official indicator column headers.
     """
     try:
-        # Get all municipalities
-        municipalities = db.query(DimMO).all()
+        # Get all municipality names
+        municipalities = db.query(DimMO.mo_name).all()
 
         # Official indicator codes
         official_indicators = [
@@ -1285,15 +1549,14 @@ async def get_official_methodology_template(db: Session = Depends(get_db)):
             'pen_1', 'pen_2', 'pen_3'
         ]
 
-        # Build CSV header
-        header = "Муниципалитет," + ",".join(official_indicators)
+        # Build CSV: header + one row per municipality (csv.writer quotes names with commas)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(["Муниципалитет"] + official_indicators)
+        empty_scores = [""] * len(official_indicators)
+        writer.writerows([mo_name] + empty_scores for mo_name, in municipalities)
 
-        # Build CSV rows with municipality names
-        rows = [header]
-        for mo in municipalities:
-            rows.append(mo.mo_name + "," + ",".join([""] * len(official_indicators)))
-
-        csv_content = "\n".join(rows)
+        csv_content = buffer.getvalue()
 
         return {
             "status": "success",
@@ -1327,8 +1590,9 @@ async def import_csv(
     """
     try:
         # Read CSV file
-        content = await file.read()
-        df = pd.read_csv(io.BytesIO(content), encoding='utf-8')
+        upload = file.file
+        upload.seek(0)
+        df = pd.read_csv(upload, encoding='utf-8')
 
         logger.info(f"CSV uploaded: {len(df)} rows, {len(df.columns)} columns")
         logger.info(f"Target period: {period_month}")
@@ -1348,11 +1612,8 @@ async def import_csv(
         date_to = period_end.strftime("%Y-%m-%d")
 
         # Create or get methodology v1
-        methodology = db.query(DimMethodology).filter(
-            DimMethodology.version == "v1"
-        ).first()
-
-        if not methodology:
+        version_id = _cached_methodology_id(db, "v1")
+        if version_id is None:
             methodology = DimMethodology(
                 version="v1",
                 valid_from="2024-01-01",
@@ -1361,14 +1622,12 @@ async def import_csv(
             db.add(methodology)
             db.commit()
             db.refresh(methodology)
-            logger.info(f"Created methodology v1 (ID: {methodology.version_id})")
+            version_id = methodology.version_id
+            logger.info(f"Created methodology v1 (ID: {version_id})")
 
         # Create or get period
-        period = db.query(DimPeriod).filter(
-            DimPeriod.date_from == date_from
-        ).first()
-
-        if not period:
+        period_id = _cached_period_id(db, date_from)
+        if period_id is None:
             period = DimPeriod(
                 period_type="month",
                 date_from=date_from,
@@ -1378,21 +1637,22 @@ async def import_csv(
             db.add(period)
             db.commit()
             db.refresh(period)
-            logger.info(f"Created period {period_month} (ID: {period.period_id})")
+            period_id = period.period_id
+            logger.info(f"Created period {period_month} (ID: {period_id})")
         else:
-            logger.info(f"Using existing period {period_month} (ID: {period.period_id})")
+            logger.info(f"Using existing period {period_month} (ID: {period_id})")
 
-        # Create municipalities
+        # Create municipalities (existing names loaded once, not queried per row)
         municipalities = df[['Муниципалитет']].drop_duplicates()
+        existing_mo_names = {mo_name for mo_name, in db.query(DimMO.mo_name)}
         mo_created = 0
 
-        for _, row in municipalities.iterrows():
-            mo_name = row['Муниципалитет']
+        for mo_name in municipalities['Муниципалитет']:
             if pd.isna(mo_name) or mo_name == '':
                 continue
 
-            existing = db.query(DimMO).filter(DimMO.mo_name == mo_name).first()
-            if not existing:
+            if mo_name not in existing_mo_names:
+                existing_mo_names.add(mo_name)
                 mo = DimMO(
                     mo_name=mo_name,
                     type="Муниципальный район"
@@ -1407,12 +1667,13 @@ async def import_csv(
         skip_columns = ['Лист', 'Муниципалитет', 'Глава МО']
         indicator_columns = [col for col in df.columns if col not in skip_columns]
 
+        existing_codes = {code for code, in db.query(DimIndicator.code)}
         ind_created = 0
         for col_name in indicator_columns:
             code = col_name[:50].replace(' ', '_').replace(',', '').replace('(', '').replace(')', '')
 
-            existing = db.query(DimIndicator).filter(DimIndicator.code == code).first()
-            if not existing:
+            if code not in existing_codes:
+                existing_codes.add(code)
                 indicator = DimIndicator(
                     code=code,
                     name=col_name,
@@ -1422,77 +1683,44 @@ async def import_csv(
                 db.add(indicator)
                 ind_created += 1
 
+        if ind_created:
+            # Новые критерии меняют справочник для всех периодов
+            from migrations import clear_fact_summary_snapshots
+            clear_fact_summary_snapshots(db)
         db.commit()
         logger.info(f"Created {ind_created} indicators")
 
         # Load indicator values
-        mo_map = {mo.mo_name: mo.mo_id for mo in db.query(DimMO).all()}
-        ind_map = {ind.name: ind.ind_id for ind in db.query(DimIndicator).all()}
-
-        values_loaded = 0
-        errors = 0
-
-        for _, row in df.iterrows():
-            mo_name = row['Муниципалитет']
-            if pd.isna(mo_name) or mo_name == '' or mo_name not in mo_map:
-                continue
-
-            mo_id = mo_map[mo_name]
-
-            for col_name in indicator_columns:
-                value = row[col_name]
-                if pd.isna(value) or value == '':
-                    continue
-
-                if col_name not in ind_map:
-                    continue
-
-                ind_id = ind_map[col_name]
-
-                # Convert value to float
-                try:
-                    if isinstance(value, str):
-                        value_clean = value.replace('%', '').replace(' ', '').replace(',', '.')
-                        try:
-                            value_raw = float(value_clean)
-                        except:
-                            value_raw = 1.0
-                    else:
-                        value_raw = float(value)
-                except:
-                    value_raw = 1.0
-
-                # Check if exists
-                existing = db.query(FactIndicator).filter(
-                    FactIndicator.mo_id == mo_id,
-                    FactIndicator.period_id == period.period_id,
-                    FactIndicator.ind_id == ind_id,
-                    FactIndicator.version_id == methodology.version_id
-                ).first()
-
-                if existing:
-                    existing.value_raw = value_raw
-                    existing.score = value_raw  # Также обновить score
-                else:
-                    fact = FactIndicator(
-                        mo_id=mo_id,
-                        period_id=period.period_id,
-                        ind_id=ind_id,
-                        version_id=methodology.version_id,
-                        value_raw=value_raw,
-                        score=value_raw  # ← ДОБАВИТЬ: заполнить score
-                    )
-                    db.add(fact)
-
-                values_loaded += 1
-
+        mo_map = dict(db.query(DimMO.mo_name, DimMO.mo_id).all())
+        ind_map = dict(db.query(DimIndicator.name, DimIndicator.ind_id).all())
+
+        # Wide CSV -> (municipality, indicator column, value); text that isn't a number loads as 1.0
+        value_columns = [col for col in indicator_columns if col in ind_map]
+        long = _melt_indicator_values(df, 'Муниципалитет', value_columns, unparsed=1.0)
+        long = long[long['Муниципалитет'].isin(mo_map.keys())]
+
+        # Fact rows built column-wise: ids are mapped once per column, not looked up per cell
+        facts = pd.DataFrame({
+            "mo_id": long['Муниципалитет'].map(mo_map),
+            "period_id": period_id,
+            "ind_id": long['indicator_column'].map(ind_map),
+            "version_id": version_id,
+            "value_raw": long['indicator_value'],
+            "score": long['indicator_value'],  # ← ДОБАВИТЬ: заполнить score
+        }).to_dict('records')
+        values_loaded = len(facts)
+
+        _write_facts(db, facts)
+        # Снапшоты рейтинга периода устарели: до пересчёта страница строит деревья вживую
+        from migrations import clear_fact_summary_snapshots
+        clear_fact_summary_snapshots(db, period_id)
         db.commit()
         logger.info(f"Loaded {values_loaded} indicator values")
 
         # Автоматически пересчитать баллы для загруженного периода
-        logger.info(f"Auto-calculating scores for period {period.period_id}...")
+        logger.info(f"Auto-calculating scores for period {period_id}...")
         try:
-            score_result = await calculate_summary_scores(period_id=period.period_id, db=db)
+            score_result = await calculate_summary_scores(period_id=period_id, db=db)
             logger.info(f"Scores calculated: {score_result}")
         except Exception as e:
             logger.error(f"Error calculating scores: {e}")
@@ -1539,6 +1767,31 @@ async def get_import_stats(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error fetching stats: {str(e)}")
 
 
+# Coordinates for Lipetsk Oblast municipalities (approximate centers)
+MO_COORDINATES = {
+    "Липецк": (52.6031, 39.5708),
+    "Елец": (52.6236, 38.5019),
+    "Воловский": (51.1528, 38.4500),
+    "Грязянский": (52.5000, 39.9500),
+    "Данковский": (53.2500, 39.1500),
+    "Добринский": (52.2000, 40.4000),
+    "Добровский": (52.3500, 39.2000),
+    "Долгоруковский": (52.3500, 38.3000),
+    "Елецкий": (52.6236, 38.5019),
+    "Задонский": (52.4000, 38.9000),
+    "Измалковский": (52.5000, 38.8000),
+    "Краснинский": (53.0000, 39.5000),
+    "Лебедянский": (53.0200, 39.1300),
+    "Лев-Толстовский": (52.1000, 39.5000),
+    "Липецкий": (52.6031, 39.5708),
+    "Становлянский": (53.0000, 38.5000),
+    "Тербунский": (52.1500, 38.2500),
+    "Усманский": (52.0500, 39.7400),
+    "Хлевенский": (52.4500, 38.1000),
+    "Чаплыгинский": (53.2500, 39.9500),
+}
+
+
 @router.post("/update-coordinates")
 async def update_municipality_coordinates(db: Session = Depends(get_db)):
     """
@@ -1546,37 +1799,20 @@ async def update_municipality_coordinates(db: Session = Depends(get_db)):
     Adds lat/lon for map visualization.
     """
     try:
-        # Coordinates for Lipetsk Oblast municipalities (approximate centers)
-        coordinates = {
-            "Липецк": (52.6031, 39.5708),
-            "Елец": (52.6236, 38.5019),
-            "Воловский": (51.1528, 38.4500),
-            "Грязянский": (52.5000, 39.9500),
-            "Данковский": (53.2500, 39.1500),
-            "Добринский": (52.2000, 40.4000),
-            "Добровский": (52.3500, 39.2000),
-            "Долгоруковский": (52.3500, 38.3000),
-            "Елецкий": (52.6236, 38.5019),
-            "Задонский": (52.4000, 38.9000),
-            "Измалковский": (52.5000, 38.8000),
-            "Краснинский": (53.0000, 39.5000),
-            "Лебедянский": (53.0200, 39.1300),
-            "Лев-Толстовский": (52.1000, 39.5000),
-            "Липецкий": (52.6031, 39.5708),
-            "Становлянский": (53.0000, 38.5000),
-            "Тербунский": (52.1500, 38.2500),
-            "Усманский": (52.0500, 39.7400),
-            "Хлевенский": (52.4500, 38.1000),
-            "Чаплыгинский": (53.2500, 39.9500),
-        }
-
-        updated = 0
-        for mo_name, (lat, lon) in coordinates.items():
-            mo = db.query(DimMO).filter(DimMO.mo_name == mo_name).first()
-            if mo:
-                mo.lat = lat
-                mo.lon = lon
-                updated += 1
+        # One UPDATE ... FROM (VALUES ...) for all municipalities instead of a SELECT + UPDATE per name
+        params = {}
+        values = []
+        for i, (mo_name, (lat, lon)) in enumerate(MO_COORDINATES.items()):
+            values.append(f"(:name_{i}, CAST(:lat_{i} AS DOUBLE PRECISION), CAST(:lon_{i} AS DOUBLE PRECISION))")
+            params.update({f"name_{i}": mo_name, f"lat_{i}": lat, f"lon_{i}": lon})
+
+        result = db.execute(text(f"""
+            UPDATE dim_mo
+            SET lat = v.lat, lon = v.lon, updated_at = NOW()
+            FROM (VALUES {", ".join(values)}) AS v(mo_name, lat, lon)
+            WHERE dim_mo.mo_name = v.mo_name
+        """), params)
+        updated = result.rowcount
 
         db.commit()
         logger.info(f"Updated coordinates for {updated} municipalities")
@@ -1593,91 +1829,134 @@ async def update_municipality_coordinates(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error updating coordinates: {str(e)}")
 
 
-@router.get("/run-migration")
-async def run_migration_page(db: Session = Depends(get_db)):
-    """
-    Execute full migration: add geojson column and populate data.
-    Returns HTML page with results.
-    """
-    from fastapi.responses import HTMLResponse
-
-    results = []
-
-    # Step 1: Add geojson column
-    try:
-        result = db.execute(text("""
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_name='dim_mo' AND column_name='geojson'
-        """))
-
-        if result.fetchone() is None:
-            db.execute(text("ALTER TABLE dim_mo ADD COLUMN geojson JSON"))
-            db.commit()
-            results.append(("✅ Миграция", "Колонка geojson успешно добавлена"))
-        else:
-            results.append(("ℹ️ Миграция", "Колонка geojson уже существует"))
-    except Exception as e:
-        results.append(("❌ Миграция", f"Ошибка: {str(e)}"))
-        db.rollback()
-
-    # Step 2: Update geojson data with realistic boundaries
-    try:
-        import math
-        municipalities = db.query(DimMO).all()
-        updated = 0
-
-        for mo in municipalities:
-            if mo.lat and mo.lon:
-                lat, lon = mo.lat, mo.lon
-
-                # Определяем размер (города меньше, районы больше)
-                if mo.mo_name in ["Липецк", "Елец"]:
-                    size = 0.12
-                else:
-                    size = 0.20
-
-                # Создаем эллиптический полигон с волнистыми краями
-                points_count = 48
-                coordinates = []
-
-                for i in range(points_count):
-                    angle = (i * 360 / points_count) * (math.pi / 180)
-
-                    # Эллиптическая форма
-                    a = size * 1.5
-                    b = size
-
-                    # Волнистость
-                    wave = 1.0 + 0.15 * math.sin(5 * angle) + 0.1 * math.cos(7 * angle)
-
-                    r = (a * b) / math.sqrt((b * math.cos(angle))**2 + (a * math.sin(angle))**2)
-                    r *= wave
-
-                    point_lat = lat + r * math.sin(angle)
-                    point_lon = lon + r * math.cos(angle) / math.cos(lat * math.pi / 180)
-
-                    coordinates.append([point_lon, point_lat])
+# Generated boundary shapes: the per-vertex angle terms are the same for every municipality,
+# so they are computed once and each polygon is a few vectorized NumPy operations
+BOUNDARY_POINTS = 48
+_BOUNDARY_ANGLES = np.linspace(0.0, 2 * np.pi, BOUNDARY_POINTS, endpoint=False)
+_BOUNDARY_SIN = np.sin(_BOUNDARY_ANGLES)
+_BOUNDARY_COS = np.cos(_BOUNDARY_ANGLES)
+# Волнистость краёв. The angles split the full circle evenly, so the k-th harmonic of
+# vertex i is the base value of vertex k*i (mod n): a table lookup, no extra trig
+_BOUNDARY_INDEX = np.arange(BOUNDARY_POINTS)
+_BOUNDARY_WAVE = (
+    1.0
+    + 0.15 * _BOUNDARY_SIN[5 * _BOUNDARY_INDEX % BOUNDARY_POINTS]
+    + 0.1 * _BOUNDARY_COS[7 * _BOUNDARY_INDEX % BOUNDARY_POINTS]
+)
+
+_HEXAGON_ANGLES = np.radians(np.arange(0, 360, 60))
+_HEXAGON_SIN = np.sin(_HEXAGON_ANGLES)
+_HEXAGON_COS = np.cos(_HEXAGON_ANGLES)
+
+
+def _boundary_offsets(size):
+    """Per-vertex (dx, dy) of the wavy ellipse for a given size, before the longitude correction"""
+    # Эллиптическая форма: большая полуось a, малая b
+    a = size * 1.5
+    b = size
+    r = (a * b) / np.sqrt((b * _BOUNDARY_COS) ** 2 + (a * _BOUNDARY_SIN) ** 2) * _BOUNDARY_WAVE
+    return r * _BOUNDARY_COS, r * _BOUNDARY_SIN
+
+
+# Only two sizes exist (cities are smaller than districts), so the whole radius profile
+# is precomputed and a polygon is just a scale-and-shift of these offsets
+_CITY_BOUNDARY_OFFSETS = _boundary_offsets(0.12)
+_DISTRICT_BOUNDARY_OFFSETS = _boundary_offsets(0.20)
+
+
+def _realistic_boundary(mo_name, lat, lon):
+    """Elliptical polygon with wavy edges around (lat, lon); cities are smaller than districts"""
+    dx, dy = _CITY_BOUNDARY_OFFSETS if mo_name in ("Липецк", "Елец") else _DISTRICT_BOUNDARY_OFFSETS
+    inv_cos_lat = 1.0 / np.cos(np.radians(lat))
+
+    # Vertices are written straight into one (points + 1, 2) array; the last row closes the ring
+    coordinates = np.empty((BOUNDARY_POINTS + 1, 2))
+    np.multiply(dx, inv_cos_lat, out=coordinates[:-1, 0])
+    coordinates[:-1, 0] += lon
+    np.add(dy, lat, out=coordinates[:-1, 1])
+
+    # Замыкаем полигон
+    coordinates[-1] = coordinates[0]
+    return {"type": "Polygon", "coordinates": [coordinates.tolist()]}
+
+
+def _hexagon_boundary(lat, lon, size=0.15):
+    """Simplified hexagon polygon around (lat, lon)"""
+    points = np.column_stack((lon + size * _HEXAGON_COS, lat + size * _HEXAGON_SIN)).tolist()
+
+    # Close the polygon
+    points.append(points[0])
+    return {"type": "Polygon", "coordinates": [points]}
+
+
+# Boundaries for the known municipality centres are generated once at import
+_REALISTIC_BOUNDARIES = {
+    mo_name: _realistic_boundary(mo_name, lat, lon) for mo_name, (lat, lon) in MO_COORDINATES.items()
+}
+_HEXAGON_BOUNDARIES = {
+    mo_name: _hexagon_boundary(lat, lon) for mo_name, (lat, lon) in MO_COORDINATES.items()
+}
+
+
+def _mo_boundary(mo_name, lat, lon, realistic=True):
+    """Precomputed polygon when the municipality sits at its known centre, otherwise generated"""
+    if MO_COORDINATES.get(mo_name) == (lat, lon):
+        return (_REALISTIC_BOUNDARIES if realistic else _HEXAGON_BOUNDARIES)[mo_name]
+    return _realistic_boundary(mo_name, lat, lon) if realistic else _hexagon_boundary(lat, lon)
+
+
+# Shared by every geojson writer: ids and documents travel as two arrays, so the statement
+# text never changes (compiled once per process) and all rows still go out in one round trip.
+# Rows whose stored document is already identical are skipped, so re-running a generator
+# rewrites nothing (json keeps its text as written, and documents always come from orjson).
+_UPDATE_MO_GEOJSON = text("""
+    UPDATE dim_mo
+    SET geojson = v.geojson, updated_at = NOW()
+    FROM unnest(CAST(:mo_ids AS INTEGER[]), CAST(:geojson_docs AS JSON[])) AS v(mo_id, geojson)
+    WHERE dim_mo.mo_id = v.mo_id
+      AND dim_mo.geojson::text IS DISTINCT FROM v.geojson::text
+""")
+
+
+def _update_mo_geojson(db, geojson_by_id):
+    """Write {mo_id: geojson} with the shared _UPDATE_MO_GEOJSON statement; returns rows actually changed"""
+    if not geojson_by_id:
+        return 0
+
+    # Documents are serialized once with orjson and cast server-side
+    result = db.execute(_UPDATE_MO_GEOJSON, {
+        "mo_ids": list(geojson_by_id),
+        "geojson_docs": [orjson.dumps(geojson).decode() for geojson in geojson_by_id.values()],
+    })
+    if result.rowcount < len(geojson_by_id):
+        logger.info(f"Skipped {len(geojson_by_id) - result.rowcount} unchanged geojson documents")
+    return result.rowcount
+
+
+def _write_mo_boundaries(db, realistic=True):
+    """Store a generated boundary for every municipality with coordinates; returns how many were written"""
+    # Only the columns the generator needs are loaded, and all rows go out in one
+    # UPDATE instead of per-object unit-of-work flushes
+    updates = {
+        mo_id: _mo_boundary(mo_name, lat, lon, realistic)
+        for mo_id, mo_name, lat, lon in db.query(DimMO.mo_id, DimMO.mo_name, DimMO.lat, DimMO.lon).yield_per(100)
+        if lat and lon
+    }
+    _update_mo_geojson(db, updates)
+    return len(updates)
 
-                # Замыкаем полигон
-                coordinates.append(coordinates[0])
 
-                geojson_data = {
-                    "type": "Polygon",
-                    "coordinates": [coordinates]
-                }
+def _geojson_column_exists(db):
+    """dim_mo.geojson lookup straight in pg_attribute (cheaper than the information_schema view)"""
+    return db.execute(text("""
+        SELECT 1 FROM pg_attribute
+        WHERE attrelid = to_regclass('dim_mo') AND attname = 'geojson' AND NOT attisdropped
+    """)).first() is not None
 
-                mo.geojson = geojson_data
-                updated += 1
 
-        db.commit()
-        results.append(("✅ GeoJSON", f"Обновлено границ: {updated} (эллиптические с волнистыми краями)"))
-    except Exception as e:
-        results.append(("❌ GeoJSON", f"Ошибка: {str(e)}"))
-        db.rollback()
-
-    # Generate HTML response
-    html_content = """
+# Static parts of the /run-migration results page, built once at import; only the
+# result blocks are filled in per request (escaped, since messages carry error text)
+_MIGRATION_PAGE_HEAD = """
     <!DOCTYPE html>
     <html lang="ru">
     <head>
@@ -1736,16 +2015,14 @@ async def run_migration_page(db: Session = Depends(get_db)):
             <h1>🔧 Результаты миграции базы данных</h1>
     """
 
-    for title, message in results:
-        status_class = "success" if "✅" in title or "ℹ️" in title else "error"
-        html_content += f"""
+_MIGRATION_PAGE_RESULT = """
             <div class="result {status_class}">
                 <h3>{title}</h3>
                 <p>{message}</p>
             </div>
         """
 
-    html_content += """
+_MIGRATION_PAGE_TAIL = """
             <a href="/map" class="button">Открыть карту</a>
             <a href="/api/docs" class="button" style="background: #6b7280;">API Docs</a>
         </div>
@@ -1753,7 +2030,56 @@ async def run_migration_page(db: Session = Depends(get_db)):
     </html>
     """
 
-    return HTMLResponse(content=html_content)
+
+@router.get("/run-migration")
+async def run_migration_page(db: Session = Depends(get_db)):
+    """
+    Execute full migration: add geojson column and populate data.
+    Returns HTML page with results.
+    """
+    from fastapi.responses import HTMLResponse
+
+    results = []
+
+    # Step 1: Add geojson column
+    try:
+        # The column is normally added at startup (apply_geojson_column_migration); DDL only
+        # runs here if that did not happen
+        if not _geojson_column_exists(db):
+            db.execute(text("ALTER TABLE dim_mo ADD COLUMN geojson JSON"))
+            db.commit()
+            results.append(("✅ Миграция", "Колонка geojson успешно добавлена"))
+        else:
+            results.append(("ℹ️ Миграция", "Колонка geojson уже существует"))
+    except Exception as e:
+        results.append(("❌ Миграция", f"Ошибка: {str(e)}"))
+        db.rollback()
+
+    # Step 2: Update geojson data with realistic boundaries
+    try:
+        # Эллиптический полигон с волнистыми краями
+        updated = _write_mo_boundaries(db)
+
+        db.commit()
+        results.append(("✅ GeoJSON", f"Обновлено границ: {updated} (эллиптические с волнистыми краями)"))
+    except Exception as e:
+        results.append(("❌ GeoJSON", f"Ошибка: {str(e)}"))
+        db.rollback()
+
+    # Generate HTML response (fragments collected and joined once)
+    parts = [_MIGRATION_PAGE_HEAD]
+
+    for title, message in results:
+        status_class = "success" if "✅" in title or "ℹ️" in title else "error"
+        parts.append(_MIGRATION_PAGE_RESULT.format(
+            status_class=status_class,
+            title=html.escape(title),
+            message=html.escape(message),
+        ))
+
+    parts.append(_MIGRATION_PAGE_TAIL)
+
+    return HTMLResponse(content="".join(parts))
 
 
 @router.post("/migrate-add-geojson")
@@ -1763,14 +2089,8 @@ async def migrate_add_geojson_column(db: Session = Depends(get_db)):
     This is a one-time migration.
     """
     try:
-        # Check if column exists
-        result = db.execute(text("""
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_name='dim_mo' AND column_name='geojson'
-        """))
-
-        if result.fetchone() is None:
+        # Check if column exists (normally added at startup by apply_geojson_column_migration)
+        if not _geojson_column_exists(db):
             # Add column
             db.execute(text("ALTER TABLE dim_mo ADD COLUMN geojson JSON"))
             db.commit()
@@ -1814,9 +2134,10 @@ async def upload_real_boundaries(
     }
     """
     try:
-        # Read uploaded file
-        content = await file.read()
-        data = json.loads(content.decode('utf-8'))
+        # orjson parses the raw bytes of the spooled upload directly (no str decode copy);
+        # its JSONDecodeError subclasses json.JSONDecodeError, handled below
+        file.file.seek(0)
+        data = orjson.loads(file.file.read())
 
         logger.info(f"Uploading real boundaries from file: {file.filename}")
 
@@ -1829,6 +2150,14 @@ async def upload_real_boundaries(
             not_found = []
             errors = []
 
+            # Municipalities are loaded once and matched in Python (case-insensitive);
+            # all geometries are then written with one UPDATE
+            mo_by_name = {
+                mo_name.lower(): (mo_id, mo_name)
+                for mo_id, mo_name in db.query(DimMO.mo_id, DimMO.mo_name)
+            }
+            geojson_by_id = {}
+
             for feature in features:
                 if feature.get("type") != "Feature":
                     errors.append(f"Invalid feature type: {feature.get('type')}")
@@ -1850,24 +2179,24 @@ async def upload_real_boundaries(
                     errors.append(f"Feature {mo_name} missing geometry")
                     continue
 
-                # Find municipality in database (case-insensitive)
-                mo = db.query(DimMO).filter(
-                    DimMO.mo_name.ilike(mo_name)
-                ).first()
+                # Find municipality (case-insensitive)
+                mo = mo_by_name.get(mo_name.lower())
 
                 if mo:
+                    mo_id, db_name = mo
                     # Store as GeoJSON Feature
-                    mo.geojson = {
+                    geojson_by_id[mo_id] = {
                         "type": "Feature",
-                        "properties": {"name": mo.mo_name},  # Use DB name for consistency
+                        "properties": {"name": db_name},  # Use DB name for consistency
                         "geometry": geometry
                     }
                     updated += 1
-                    logger.info(f"Updated {mo.mo_name}")
+                    logger.info(f"Updated {db_name}")
                 else:
                     not_found.append(mo_name)
                     logger.warning(f"Municipality not found in DB: {mo_name}")
 
+            _update_mo_geojson(db, geojson_by_id)
             db.commit()
 
             return {
@@ -1885,18 +2214,21 @@ async def upload_real_boundaries(
 
             updated = 0
             not_found = []
+            mo_ids = dict(db.query(DimMO.mo_name, DimMO.mo_id).all())
+            geojson_by_id = {}
 
             for mo_name, geojson_data in data.items():
-                mo = db.query(DimMO).filter(DimMO.mo_name == mo_name).first()
+                mo_id = mo_ids.get(mo_name)
 
-                if mo:
-                    mo.geojson = geojson_data
+                if mo_id is not None:
+                    geojson_by_id[mo_id] = geojson_data
                     updated += 1
                     logger.info(f"Updated {mo_name}")
                 else:
                     not_found.append(mo_name)
                     logger.warning(f"Municipality not found in DB: {mo_name}")
 
+            _update_mo_geojson(db, geojson_by_id)
             db.commit()
 
             return {
@@ -1922,54 +2254,9 @@ async def update_municipality_geojson_realistic(db: Session = Depends(get_db)):
     Update GeoJSON boundaries with realistic elliptical shapes.
     Creates more natural-looking boundaries based on municipality centers.
     """
-    import math
-
     try:
-        municipalities = db.query(DimMO).all()
-        updated = 0
-
-        for mo in municipalities:
-            if mo.lat and mo.lon:
-                lat, lon = mo.lat, mo.lon
-
-                # Определяем размер на основе названия (города меньше, районы больше)
-                if mo.mo_name in ["Липецк", "Елец"]:
-                    size = 0.12
-                else:
-                    size = 0.20
-
-                # Создаем эллиптический полигон с волнистыми краями
-                points = 48
-                coordinates = []
-
-                for i in range(points):
-                    angle = (i * 360 / points) * (math.pi / 180)
-
-                    # Эллиптическая форма
-                    a = size * 1.5  # Большая полуось
-                    b = size  # Малая полуось
-
-                    # Добавляем волнистость
-                    wave = 1.0 + 0.15 * math.sin(5 * angle) + 0.1 * math.cos(7 * angle)
-
-                    r = (a * b) / math.sqrt((b * math.cos(angle))**2 + (a * math.sin(angle))**2)
-                    r *= wave
-
-                    point_lat = lat + r * math.sin(angle)
-                    point_lon = lon + r * math.cos(angle) / math.cos(lat * math.pi / 180)
-
-                    coordinates.append([point_lon, point_lat])
-
-                # Замыкаем полигон
-                coordinates.append(coordinates[0])
-
-                geojson_data = {
-                    "type": "Polygon",
-                    "coordinates": [coordinates]
-                }
-
-                mo.geojson = geojson_data
-                updated += 1
+        # Эллиптический полигон с волнистыми краями (см. _realistic_boundary)
+        updated = _write_mo_boundaries(db)
 
         db.commit()
         logger.info(f"Updated realistic GeoJSON for {updated} municipalities")
@@ -1995,36 +2282,9 @@ async def update_municipality_geojson(db: Session = Depends(get_db)):
     In production, this should be replaced with real GeoJSON data from OpenStreetMap or similar.
     """
     try:
-        municipalities = db.query(DimMO).all()
-        updated = 0
-
-        for mo in municipalities:
-            if mo.lat and mo.lon:
-                # Generate a more realistic polygon (hexagon instead of rectangle)
-                # This is still simplified - real boundaries should come from OSM
-                size = 0.15
-                lat, lon = mo.lat, mo.lon
-
-                # Create a hexagon-like shape
-                import math
-                points = []
-                for i in range(6):
-                    angle = (i * 60) * (math.pi / 180)
-                    point_lon = lon + size * math.cos(angle)
-                    point_lat = lat + size * math.sin(angle)
-                    points.append([point_lon, point_lat])
-
-                # Close the polygon
-                points.append(points[0])
-
-                # GeoJSON Polygon format
-                geojson_data = {
-                    "type": "Polygon",
-                    "coordinates": [points]
-                }
-
-                mo.geojson = geojson_data
-                updated += 1
+        # Generate a more realistic polygon (hexagon instead of rectangle)
+        # This is still simplified - real boundaries should come from OSM
+        updated = _write_mo_boundaries(db, realistic=False)
 
         db.commit()
         logger.info(f"Updated GeoJSON for {updated} municipalities")
@@ -2055,99 +2315,62 @@ async def calculate_summary_scores(
     - period_id: Optional. If not provided, calculates for all periods.
     """
     try:
-        from models import FactSummary
-
-        # Get all municipalities
-        municipalities = db.query(DimMO).all()
-
         # Get periods
         if period_id:
-            periods = [db.query(DimPeriod).filter(DimPeriod.period_id == period_id).first()]
-            if not periods[0]:
+            if db.query(DimPeriod.period_id).filter(DimPeriod.period_id == period_id).first() is None:
                 raise HTTPException(status_code=404, detail=f"Period {period_id} not found")
+            periods_count = 1
         else:
             # Calculate for all periods
-            periods = db.query(DimPeriod).all()
+            periods_count = db.query(func.count(DimPeriod.period_id)).scalar()
 
-        methodology = db.query(DimMethodology).filter(DimMethodology.version == "v1").first()
+        version_id = _cached_methodology_id(db, "v1")
 
-        if not periods or not methodology:
+        if not periods_count or version_id is None:
             raise HTTPException(status_code=404, detail="Period or methodology not found")
 
-        total_created = 0
-        total_updated = 0
-
-        # Process each period
-        for period in periods:
-            created = 0
-            updated = 0
-
-            for mo in municipalities:
-                # Get all indicator values for this MO and period
-                indicator_values = db.query(FactIndicator).filter(
-                    FactIndicator.mo_id == mo.mo_id,
-                    FactIndicator.period_id == period.period_id,
-                    FactIndicator.version_id == methodology.version_id
-                ).all()
-
-                if not indicator_values:
-                    continue
-
-                # Calculate simple average score (можно сделать более сложную логику)
-                total_values = sum([v.value_raw for v in indicator_values if v.value_raw])
-                count_values = len([v for v in indicator_values if v.value_raw])
-
-                if count_values > 0:
-                    avg_score = total_values / count_values
-                    # Normalize to 0-100 scale
-                    score_total = min(100, max(0, avg_score))
+        # One INSERT ... SELECT for every (MO, period) with indicator values: simple average of
+        # the non-zero value_raw (можно сделать более сложную логику), clamped to 0-100.
+        # (xmax = 0) tells inserted rows from updated ones.
+        period_filter = "AND period_id = :period_id" if period_id else ""
+        rows = db.execute(text(f"""
+            INSERT INTO fact_summary (mo_id, period_id, version_id, score_public, score_total, zone)
+            SELECT mo_id, period_id, :version_id, score, score,
+                   CASE WHEN score >= 70 THEN 'green' WHEN score >= 40 THEN 'yellow' ELSE 'red' END
+            FROM (
+                SELECT mo_id, period_id,
+                       COALESCE(LEAST(100, GREATEST(0, AVG(value_raw) FILTER (WHERE value_raw <> 0))), 0) AS score
+                FROM fact_indicator
+                WHERE version_id = :version_id {period_filter}
+                GROUP BY mo_id, period_id
+            ) scores
+            ON CONFLICT (mo_id, period_id, version_id) DO UPDATE SET
+                score_public = EXCLUDED.score_public,
+                score_total = EXCLUDED.score_total,
+                zone = EXCLUDED.zone,
+                updated_at = NOW()
+            RETURNING period_id, (xmax = 0) AS inserted
+        """), {"version_id": version_id, "period_id": period_id}).all()
+
+        from migrations import refresh_fact_summary_snapshots
+        refresh_fact_summary_snapshots(db, period_id)
+        db.commit()
 
-                    # Determine zone based on score
-                    if score_total >= 70:
-                        zone = "green"
-                    elif score_total >= 40:
-                        zone = "yellow"
-                    else:
-                        zone = "red"
-                else:
-                    score_total = 0
-                    zone = "red"
-
-                # Check if summary exists
-                existing = db.query(FactSummary).filter(
-                    FactSummary.mo_id == mo.mo_id,
-                    FactSummary.period_id == period.period_id,
-                    FactSummary.version_id == methodology.version_id
-                ).first()
-
-                if existing:
-                    existing.score_total = score_total
-                    existing.score_public = score_total
-                    existing.zone = zone
-                    updated += 1
-                else:
-                    summary = FactSummary(
-                        mo_id=mo.mo_id,
-                        period_id=period.period_id,
-                        version_id=methodology.version_id,
-                        score_public=score_total,
-                        score_total=score_total,
-                        zone=zone
-                    )
-                    db.add(summary)
-                    created += 1
-
-            total_created += created
-            total_updated += updated
-            logger.info(f"Period {period.period_id}: Created {created}, updated {updated}")
+        per_period = {}
+        for row_period_id, inserted in rows:
+            counts = per_period.setdefault(row_period_id, [0, 0])
+            counts[0 if inserted else 1] += 1
+        for row_period_id, (created, updated) in sorted(per_period.items()):
+            logger.info(f"Period {row_period_id}: Created {created}, updated {updated}")
 
-        db.commit()
+        total_created = sum(created for created, _ in per_period.values())
+        total_updated = len(rows) - total_created
         logger.info(f"Total: Created {total_created} summaries, updated {total_updated}")
 
         return {
             "status": "success",
-            "message": f"Calculated scores for {len(periods)} period(s)",
-            "periods_processed": len(periods),
+            "message": f"Calculated scores for {periods_count} period(s)",
+            "periods_processed": periods_count,
             "created": total_created,
             "updated": total_updated
         }
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from sqlalchemy import cast, func, Float
 from typing import Optional
 import logging
 
@@ -58,14 +59,16 @@ async def get_mo_indicators(
 ):
     """Get all indicators for a specific MO"""
     try:
+        # Numbers come back as response-ready floats: cast to double precision,
+        # with 0 mapped to NULL as the response has always done
         query = db.query(
             DimIndicator.ind_id,
             DimIndicator.code,
             DimIndicator.name,
             DimIndicator.block,
-            FactIndicator.value_raw,
-            FactIndicator.score,
-            FactIndicator.target,
+            func.nullif(cast(FactIndicator.value_raw, Float), 0).label("value_raw"),
+            func.nullif(cast(FactIndicator.score, Float), 0).label("score"),
+            func.nullif(cast(FactIndicator.target, Float), 0).label("target"),
         ).join(
             FactIndicator,
             DimIndicator.ind_id == FactIndicator.ind_id
@@ -82,18 +85,7 @@ async def get_mo_indicators(
             "status": "success",
             "mo_id": mo_id,
             "count": len(results),
-            "data": [
-                {
-                    "ind_id": r[0],
-                    "code": r[1],
-                    "name": r[2],
-                    "block": r[3],
-                    "value_raw": float(r[4]) if r[4] else None,
-                    "score": float(r[5]) if r[5] else None,
-                    "target": float(r[6]) if r[6] else None,
-                }
-                for r in results
-            ],
+            "data": [dict(r._mapping) for r in results],
         }
 
     except Exception as e:
@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, cast, func, Float
 from typing import Optional
 from datetime import datetime
 import logging
 
 from database import get_db
-from models import DimMO, FactSummary, DimPeriod, DimMethodology
+from period_lookup import period_id_for_date
+from models import DimMO, FactSummary, DimMethodology
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -23,52 +24,35 @@ async def get_map_data(
     Returns GeoJSON-compatible features for map visualization.
     """
     try:
-        query = db.query(
-            DimMO.mo_id,
-            DimMO.mo_name,
-            DimMO.lat,
-            DimMO.lon,
-            DimMO.geojson,
-            FactSummary.score_total,
-            FactSummary.zone,
-        ).outerjoin(
-            FactSummary,
-            and_(
-                DimMO.mo_id == FactSummary.mo_id,
-                DimMO.mo_id == FactSummary.mo_id,
-            )
-        )
+        # Period/version predicates belong to the outer join itself, so municipalities
+        # without a summary are still returned (with empty score and zone)
+        join_cond = [DimMO.mo_id == FactSummary.mo_id]
 
         if period:
             # Find period by date string
             period_date = datetime.strptime(period, "%Y-%m").date()
-            period_obj = db.query(DimPeriod).filter(
-                and_(
-                    DimPeriod.date_from <= period_date,
-                    DimPeriod.date_to >= period_date,
-                )
-            ).first()
+            period_id = period_id_for_date(db, period_date)
 
-            if period_obj:
-                query = query.filter(FactSummary.period_id == period_obj.period_id)
+            if period_id:
+                join_cond.append(FactSummary.period_id == period_id)
 
         if version:
-            query = query.filter(FactSummary.version_id == version)
+            join_cond.append(FactSummary.version_id == version)
 
-        results = query.all()
+        # Values come back from the database as response-ready floats: cast to double
+        # precision, with 0 / '' mapped to NULL as the response has always done
+        query = db.query(
+            DimMO.mo_id,
+            DimMO.mo_name,
+            func.nullif(cast(DimMO.lat, Float), 0).label("lat"),
+            func.nullif(cast(DimMO.lon, Float), 0).label("lon"),
+            DimMO.geojson,
+            func.nullif(cast(FactSummary.score_total, Float), 0).label("score_total"),
+            func.nullif(FactSummary.zone, "").label("zone"),
+        ).outerjoin(FactSummary, and_(*join_cond))
 
         # Format response
-        features = []
-        for mo_id, mo_name, lat, lon, geojson, score, zone in results:
-            features.append({
-                "mo_id": mo_id,
-                "mo_name": mo_name,
-                "lat": float(lat) if lat else None,
-                "lon": float(lon) if lon else None,
-                "geojson": geojson,
-                "score_total": float(score) if score else None,
-                "zone": zone if zone else None,
-            })
+        features = [dict(row._mapping) for row in query]
 
         return {
             "status": "success",
@@ -102,15 +86,10 @@ async def get_mo_details(
 
         if period:
             period_date = datetime.strptime(period, "%Y-%m").date()
-            period_obj = db.query(DimPeriod).filter(
-                and_(
-                    DimPeriod.date_from <= period_date,
-                    DimPeriod.date_to >= period_date,
-                )
-            ).first()
-            if period_obj:
+            period_id = period_id_for_date(db, period_date)
+            if period_id:
                 summary_query = summary_query.filter(
-                    FactSummary.period_id == period_obj.period_id
+                    FactSummary.period_id == period_id
                 )
 
         if version:
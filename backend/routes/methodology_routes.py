@@ -1,36 +1,45 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 import logging
 
 from database import get_db
+from response_cache import cache_generation, cache_response, get_cached_response
 from models import DimMethodology, MapScale
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+# Read-only reference data: plain column selects mapped straight to response dicts
+# (no ORM instances), run in the threadpool like the rating handlers.
 @router.get("/versions")
-async def get_methodology_versions(db: Session = Depends(get_db)):
+def get_methodology_versions(db: Session = Depends(get_db)):
     """Get all methodology versions"""
     try:
-        versions = db.query(DimMethodology).order_by(
-            DimMethodology.valid_from.desc()
-        ).all()
+        cached = get_cached_response(("methodology_versions",))
+        if cached is not None:
+            return ORJSONResponse(cached)
+        generation = cache_generation()
 
-        return {
+        versions = db.execute(
+            select(
+                DimMethodology.version_id,
+                DimMethodology.version,
+                DimMethodology.valid_from,
+                DimMethodology.valid_to,
+                DimMethodology.notes,
+            ).order_by(DimMethodology.valid_from.desc())
+        ).mappings().all()
+
+        response = {
             "status": "success",
             "count": len(versions),
-            "data": [
-                {
-                    "version_id": v.version_id,
-                    "version": v.version,
-                    "valid_from": v.valid_from.isoformat() if v.valid_from else None,
-                    "valid_to": v.valid_to.isoformat() if v.valid_to else None,
-                    "notes": v.notes,
-                }
-                for v in versions
-            ],
+            "data": [dict(v) for v in versions],
         }
+        cache_response(("methodology_versions",), response, generation)
+        return ORJSONResponse(response)
 
     except Exception as e:
         logger.error(f"Error fetching methodology versions: {str(e)}")
@@ -38,33 +47,37 @@ async def get_methodology_versions(db: Session = Depends(get_db)):
 
 
 @router.get("/{version_id}/scales")
-async def get_scales(version_id: int, db: Session = Depends(get_db)):
+def get_scales(version_id: int, db: Session = Depends(get_db)):
     """Get scales (shading/zones) for a specific methodology version"""
     try:
-        scales = db.query(MapScale).filter(
-            MapScale.version_id == version_id
-        ).all()
+        cached = get_cached_response(("scales", version_id))
+        if cached is not None:
+            return ORJSONResponse(cached)
+        generation = cache_generation()
+
+        scales = db.execute(
+            select(
+                MapScale.scale_id,
+                MapScale.zone,
+                func.coalesce(MapScale.min_score, 0).label("min_score"),
+                func.coalesce(MapScale.max_score, 0).label("max_score"),
+                MapScale.color_hex,
+                MapScale.ind_id,
+                MapScale.pen_id,
+            ).where(MapScale.version_id == version_id)
+        ).mappings().all()
 
         if not scales:
             raise HTTPException(status_code=404, detail="Scales not found")
 
-        return {
+        response = {
             "status": "success",
             "version_id": version_id,
             "count": len(scales),
-            "data": [
-                {
-                    "scale_id": s.scale_id,
-                    "zone": s.zone,
-                    "min_score": float(s.min_score) if s.min_score else 0,
-                    "max_score": float(s.max_score) if s.max_score else 0,
-                    "color_hex": s.color_hex,
-                    "ind_id": s.ind_id,
-                    "pen_id": s.pen_id,
-                }
-                for s in scales
-            ],
+            "data": [dict(s) for s in scales],
         }
+        cache_response(("scales", version_id), response, generation)
+        return ORJSONResponse(response)
 
     except HTTPException:
         raise
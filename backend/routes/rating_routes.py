@@ -3,25 +3,70 @@ Rating routes - Get ratings for municipalities with hierarchical block structure
 Handles both cases: with and without leader_name field.
 Returns criteria organized by blocks (categories).
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, text
-from typing import Optional, List, Dict
-from datetime import datetime
+from sqlalchemy import and_, asc, desc, func, inspect, literal, text
+from typing import Optional, List, Dict, Tuple
+from datetime import date, datetime
+from functools import lru_cache
 import logging
 
 from database import get_db
-from models import DimMO, FactSummary, DimPeriod, DimIndicator, DimCriteriaBlock, DimPenalty, FactIndicator, FactPenalty
+from migrations import RATING_BLOCKS_JSON_SQL, RATING_PENALTIES_JSON_SQL
+from period_lookup import period_id_for_date
+from response_cache import cache_generation, cache_response, etag_response, get_cached_response, render_json
+from models import DimMO, FactSummary
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
+def _has_leader_name(bind) -> bool:
+    """Check once per engine whether dim_mo has the leader_name column."""
+    has_column = any(c["name"] == "leader_name" for c in inspect(bind).get_columns("dim_mo"))
+    if not has_column:
+        logger.warning("leader_name column does not exist, proceeding without it")
+    return has_column
+
+
+def _leader_name_column(db: Session):
+    """leader_name with the "Не указано" fallback applied in SQL (constant if the column is missing)"""
+    if _has_leader_name(db.get_bind()):
+        return func.coalesce(func.nullif(DimMO.leader_name, ""), "Не указано").label("leader_name")
+    return literal("Не указано").label("leader_name")
+
+
+def _score_column(column):
+    """Score column with NULL -> 0 done by Postgres, labelled with the column name"""
+    return func.coalesce(column, 0).label(column.key)
+
+
+# Sortable rating columns and directions for the ?sort= / ?order= parameters
+_SORT_COLUMNS = {
+    "score_total": FactSummary.score_total,
+    "score_public": FactSummary.score_public,
+    "mo_name": DimMO.mo_name,
+}
+_SORT_DIRECTIONS = {"asc": asc, "desc": desc}
+
+
+def _parse_period(period: str) -> date:
+    """Parse a "YYYY-MM" period parameter (HTTP 400 if malformed)"""
+    try:
+        return datetime.strptime(period, "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid period format")
+
+
 @router.get("")
-async def get_rating(
+def get_rating(
+    request: Request,
     period: Optional[str] = Query(None),
+    period_id: Optional[int] = Query(None, description="Period id; takes precedence over period"),
     version: Optional[int] = Query(None),
-    sort: str = Query("score_total", description="Field to sort by"),
+    sort: str = Query("score_total", description="Field to sort by: score_total, score_public or mo_name"),
     order: str = Query("desc", description="Sort order: asc or desc"),
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=500),
@@ -31,146 +76,114 @@ async def get_rating(
     Get rating table with MO scores.
     Supports sorting, pagination, and filtering by period/version.
     Works with or without leader_name field.
+
+    Plain def: the sync Session blocks, so FastAPI runs this in its threadpool
+    instead of on the event loop.
+    The page is cached already encoded with its ETag; a client sending that ETag back
+    in If-None-Match gets 304 Not Modified.
     """
     try:
-        # Check if leader_name column exists
-        has_leader_name = False
-        try:
-            # Try to query with leader_name
-            db.execute(
-                text("SELECT leader_name FROM dim_mo LIMIT 1")
-            )
-            has_leader_name = True
-        except Exception as e:
-            # Rollback failed transaction
-            db.rollback()
-            has_leader_name = False
-            logger.warning(f"leader_name column does not exist, proceeding without it: {str(e)}")
-
-        # Build query based on column availability
-        if has_leader_name:
-            query = db.query(
-                DimMO.mo_id,
-                DimMO.mo_name,
-                DimMO.leader_name,
-                FactSummary.score_public,
-                FactSummary.score_closed,
-                FactSummary.score_penalties,
-                FactSummary.score_total,
-                FactSummary.zone,
-                FactSummary.updated_at,
-            ).join(
-                FactSummary,
-                and_(DimMO.mo_id == FactSummary.mo_id)
-            )
-        else:
-            query = db.query(
-                DimMO.mo_id,
-                DimMO.mo_name,
-                text("NULL as leader_name"),
-                FactSummary.score_public,
-                FactSummary.score_closed,
-                FactSummary.score_penalties,
-                FactSummary.score_total,
-                FactSummary.zone,
-                FactSummary.updated_at,
-            ).join(
-                FactSummary,
-                and_(DimMO.mo_id == FactSummary.mo_id)
-            )
+        period_date = _parse_period(period) if period and period_id is None else None
+
+        cache_key = ("rating", period, period_id, version, sort, order, page, page_size)
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            return etag_response(request, *cached)
+        # Taken before querying: an import committed meanwhile must not be cached over
+        generation = cache_generation()
+
+        # Defaults (leader name, 0 for missing scores) are applied by Postgres
+        query = db.query(
+            DimMO.mo_id,
+            DimMO.mo_name,
+            _leader_name_column(db),
+            _score_column(FactSummary.score_public),
+            _score_column(FactSummary.score_closed),
+            _score_column(FactSummary.score_penalties),
+            _score_column(FactSummary.score_total),
+            FactSummary.zone,
+            FactSummary.updated_at,
+        ).join(
+            FactSummary,
+            and_(DimMO.mo_id == FactSummary.mo_id)
+        )
 
-        if period:
-            try:
-                period_date = datetime.strptime(period, "%Y-%m").date()
-                period_obj = db.query(DimPeriod).filter(
-                    and_(
-                        DimPeriod.date_from <= period_date,
-                        DimPeriod.date_to >= period_date,
-                    )
-                ).first()
-                if period_obj:
-                    query = query.filter(FactSummary.period_id == period_obj.period_id)
-                else:
-                    logger.warning(f"Period not found for date: {period_date}")
-                    return {
-                        "status": "success",
-                        "total": 0,
-                        "page": page,
-                        "page_size": page_size,
-                        "total_pages": 0,
-                        "data": [],
-                    }
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid period format")
+        # period_id is reused below for the block/penalty lookups
+        if period_date:
+            period_id = period_id_for_date(db, period_date)
+            if period_id is None:
+                logger.warning(f"Period not found for date: {period_date}")
+                return {
+                    "status": "success",
+                    "total": 0,
+                    "page": page,
+                    "page_size": page_size,
+                    "total_pages": 0,
+                    "data": [],
+                }
+        if period_id is not None:
+            query = query.filter(FactSummary.period_id == period_id)
 
         if version:
             query = query.filter(FactSummary.version_id == version)
 
-        # Apply sorting
-        if sort == "score_total":
-            sort_col = FactSummary.score_total
-        elif sort == "score_public":
-            sort_col = FactSummary.score_public
-        elif sort == "mo_name":
-            sort_col = DimMO.mo_name
-        else:
-            sort_col = FactSummary.score_total
-
-        if order.lower() == "asc":
-            query = query.order_by(sort_col.asc())
-        else:
-            query = query.order_by(sort_col.desc())
+        # Apply sorting (unknown values fall back to score_total / desc)
+        sort_col = _SORT_COLUMNS.get(sort, FactSummary.score_total)
+        query = query.order_by(_SORT_DIRECTIONS.get(order.lower(), desc)(sort_col))
 
-        # Count total
-        total = query.count()
+        # With period and version fixed, a summary row's prebuilt snapshot is exactly the
+        # block/penalty tree the live queries below would build for it
+        use_snapshots = period_id is not None and bool(version)
+        extra_columns = [func.count().over().label("total_rows")]
+        if use_snapshots:
+            extra_columns += [FactSummary.blocks_json, FactSummary.penalties_json]
 
-        # Apply pagination
+        # Total comes with the page itself (COUNT(*) OVER () is evaluated before LIMIT/OFFSET)
         offset = (page - 1) * page_size
-        results = query.offset(offset).limit(page_size).all()
+        results = query.add_columns(*extra_columns).offset(offset).limit(page_size).all()
 
-        # Determine period_id for fetching indicators and penalties
-        period_id = None
-        if period:
-            try:
-                period_date = datetime.strptime(period, "%Y-%m").date()
-                period_obj = db.query(DimPeriod).filter(
-                    and_(
-                        DimPeriod.date_from <= period_date,
-                        DimPeriod.date_to >= period_date,
-                    )
-                ).first()
-                if period_obj:
-                    period_id = period_obj.period_id
-            except ValueError:
-                pass
+        if results:
+            total = results[0].total_rows
+        elif offset:
+            # Page past the end returns no rows to read the total from
+            total = query.count()
+        else:
+            total = 0
+
+        snapshots = {}
+        if use_snapshots:
+            snapshots = {
+                r[0]: (r.blocks_json, r.penalties_json)
+                for r in results
+                if r.blocks_json is not None and r.penalties_json is not None
+            }
+
+        # Blocks and penalties for the MOs without a snapshot, in one batch
+        mo_ids = [r[0] for r in results if r[0] not in snapshots]
+        snapshots.update(get_rating_trees_for_mos(db, mo_ids, period_id, version))
 
         # Format response with hierarchical block structure
         items = []
         for r in results:
             mo_id = r[0]
-
-            # Fetch criteria blocks with their indicators for this MO
-            blocks = get_criteria_blocks_for_mo(db, mo_id, period_id, version)
-
-            # Fetch penalties for this MO
-            penalties = get_penalties_for_mo(db, mo_id, period_id, version)
+            blocks, penalties = snapshots.get(mo_id, ([], []))
 
             item = {
                 "mo_id": mo_id,
                 "mo_name": r[1],
-                "leader_name": r[2] or "Не указано",
-                "score_public": float(r[3]) if r[3] else 0,
-                "score_closed": float(r[4]) if r[4] else 0,
-                "score_penalties": float(r[5]) if r[5] else 0,
-                "score_total": float(r[6]) if r[6] else 0,
+                "leader_name": r[2],
+                "score_public": r[3],
+                "score_closed": r[4],
+                "score_penalties": r[5],
+                "score_total": r[6],
                 "zone": r[7],
-                "updated_at": r[8].isoformat() if r[8] else None,
+                "updated_at": r[8],
                 "blocks": blocks,  # Hierarchical block structure
                 "penalties": penalties,  # Penalty information
             }
             items.append(item)
 
-        return {
+        response = {
             "status": "success",
             "total": total,
             "page": page,
@@ -178,6 +191,9 @@ async def get_rating(
             "total_pages": (total + page_size - 1) // page_size,
             "data": items,
         }
+        body, etag = render_json(response)
+        cache_response(cache_key, (body, etag), generation)
+        return etag_response(request, body, etag)
 
     except HTTPException:
         raise
@@ -187,93 +203,60 @@ async def get_rating(
 
 
 @router.get("/comparison")
-async def compare_mos(
+def compare_mos(
     mo_ids: str = Query(..., description="Comma-separated MO IDs"),
     period: Optional[str] = Query(None),
+    period_id: Optional[int] = Query(None, description="Period id; takes precedence over period"),
     db: Session = Depends(get_db),
 ):
     """
     Compare multiple MOs side-by-side.
+    Plain def (threadpool) for the same reason as get_rating.
     """
     try:
         mo_id_list = [int(x.strip()) for x in mo_ids.split(",")]
 
-        # Check if leader_name exists
-        has_leader_name = False
-        try:
-            db.execute(text("SELECT leader_name FROM dim_mo LIMIT 1"))
-            has_leader_name = True
-        except Exception as e:
-            # Rollback failed transaction
-            db.rollback()
-            has_leader_name = False
-            logger.warning(f"leader_name column does not exist in comparison endpoint: {str(e)}")
-
-        if has_leader_name:
-            query = db.query(
-                DimMO.mo_id,
-                DimMO.mo_name,
-                DimMO.leader_name,
-                FactSummary.score_public,
-                FactSummary.score_closed,
-                FactSummary.score_total,
-                FactSummary.zone,
-            ).join(
-                FactSummary,
-                DimMO.mo_id == FactSummary.mo_id
-            ).filter(
-                DimMO.mo_id.in_(mo_id_list)
-            )
-        else:
-            query = db.query(
-                DimMO.mo_id,
-                DimMO.mo_name,
-                text("NULL as leader_name"),
-                FactSummary.score_public,
-                FactSummary.score_closed,
-                FactSummary.score_total,
-                FactSummary.zone,
-            ).join(
-                FactSummary,
-                DimMO.mo_id == FactSummary.mo_id
-            ).filter(
-                DimMO.mo_id.in_(mo_id_list)
-            )
+        cache_key = ("comparison", tuple(mo_id_list), period, period_id)
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            return ORJSONResponse(cached)
+        generation = cache_generation()
+
+        query = db.query(
+            DimMO.mo_id,
+            DimMO.mo_name,
+            _leader_name_column(db),
+            _score_column(FactSummary.score_public),
+            _score_column(FactSummary.score_closed),
+            _score_column(FactSummary.score_total),
+            FactSummary.zone,
+        ).join(
+            FactSummary,
+            DimMO.mo_id == FactSummary.mo_id
+        ).filter(
+            DimMO.mo_id.in_(mo_id_list)
+        )
 
-        if period:
+        # Unknown or malformed period: compare across all periods
+        if period_id is None and period:
             try:
-                period_date = datetime.strptime(period, "%Y-%m").date()
-                period_obj = db.query(DimPeriod).filter(
-                    and_(
-                        DimPeriod.date_from <= period_date,
-                        DimPeriod.date_to >= period_date,
-                    )
-                ).first()
-                if period_obj:
-                    query = query.filter(FactSummary.period_id == period_obj.period_id)
+                period_id = period_id_for_date(db, datetime.strptime(period, "%Y-%m").date())
             except ValueError:
                 pass
+        if period_id is not None:
+            query = query.filter(FactSummary.period_id == period_id)
 
         results = query.all()
 
-        items = [
-            {
-                "mo_id": r[0],
-                "mo_name": r[1],
-                "leader_name": r[2] or "Не указано",
-                "score_public": float(r[3]) if r[3] else 0,
-                "score_closed": float(r[4]) if r[4] else 0,
-                "score_total": float(r[5]) if r[5] else 0,
-                "zone": r[6],
-            }
-            for r in results
-        ]
+        items = [dict(r._mapping) for r in results]
 
-        return {
+        response = {
             "status": "success",
             "count": len(items),
             "data": items,
         }
+        cache_response(cache_key, response, generation)
+        return ORJSONResponse(response)
 
     except Exception as e:
         logger.error(f"Error comparing MOs: {str(e)}", exc_info=True)
@@ -299,57 +282,7 @@ def get_criteria_blocks_for_mo(db: Session, mo_id: int, period_id: Optional[int]
         }
     ]
     """
-    try:
-        # Get all criteria blocks ordered by block_order
-        blocks = db.query(DimCriteriaBlock).order_by(DimCriteriaBlock.block_order).all()
-
-        result = []
-        for block in blocks:
-            # Get indicators for this block
-            indicators = db.query(DimIndicator).filter(
-                DimIndicator.block_id == block.block_id
-            ).order_by(DimIndicator.weight.desc()).all()
-
-            criteria_list = []
-            block_score = 0
-
-            for indicator in indicators:
-                # Get fact value for this indicator
-                fact_query = db.query(FactIndicator).filter(
-                    FactIndicator.mo_id == mo_id,
-                    FactIndicator.ind_id == indicator.ind_id
-                )
-
-                if period_id:
-                    fact_query = fact_query.filter(FactIndicator.period_id == period_id)
-                if version_id:
-                    fact_query = fact_query.filter(FactIndicator.version_id == version_id)
-
-                fact = fact_query.first()
-                score = float(fact.score) if fact and fact.score else 0
-                block_score += score
-
-                criteria_list.append({
-                    "code": indicator.code,
-                    "name": indicator.name,
-                    "description": indicator.description,
-                    "is_public": indicator.is_public,
-                    "score": score,
-                })
-
-            result.append({
-                "block_id": block.block_id,
-                "block_name": block.block_name,
-                "block_order": block.block_order,
-                "score": block_score,
-                "criteria_count": len(criteria_list),
-                "criteria": criteria_list,
-            })
-
-        return result
-    except Exception as e:
-        logger.warning(f"Error fetching criteria blocks for MO {mo_id}: {str(e)}")
-        return []
+    return get_rating_trees_for_mos(db, [mo_id], period_id, version_id).get(mo_id, ([], []))[0]
 
 
 def get_penalties_for_mo(db: Session, mo_id: int, period_id: Optional[int], version_id: Optional[int]) -> List[Dict]:
@@ -357,34 +290,42 @@ def get_penalties_for_mo(db: Session, mo_id: int, period_id: Optional[int], vers
     Fetch penalties for a specific MO.
     Returns: List of penalties with their scores and details.
     """
-    try:
-        penalty_query = db.query(FactPenalty).filter(
-            FactPenalty.mo_id == mo_id
-        )
+    return get_rating_trees_for_mos(db, [mo_id], period_id, version_id).get(mo_id, ([], []))[1]
+
 
+def get_rating_trees_for_mos(db: Session, mo_ids: List[int], period_id: Optional[int], version_id: Optional[int]) -> Dict[int, Tuple[List[Dict], List[Dict]]]:
+    """
+    Fetch criteria blocks and penalties for several MOs in one query; Postgres builds the
+    JSON trees (same SQL as the fact_summary snapshots).
+    Returns: {mo_id: (blocks, penalties)}
+    """
+    if not mo_ids:
+        return {}
+
+    try:
+        fact_filters, penalty_filters = "", ""
         if period_id:
-            penalty_query = penalty_query.filter(FactPenalty.period_id == period_id)
+            fact_filters += " AND period_id = :period_id"
+            penalty_filters += " AND fp.period_id = :period_id"
         if version_id:
-            penalty_query = penalty_query.filter(FactPenalty.version_id == version_id)
-
-        facts = penalty_query.all()
-
-        result = []
-        for fact in facts:
-            penalty = db.query(DimPenalty).filter(
-                DimPenalty.pen_id == fact.pen_id
-            ).first()
-
-            if penalty:
-                result.append({
-                    "code": penalty.code,
-                    "name": penalty.name,
-                    "description": penalty.description,
-                    "block": penalty.block or "Штрафные критерии",
-                    "score": float(fact.score_negative) if fact.score_negative else 0,
-                })
-
-        return result
+            fact_filters += " AND version_id = :version_id"
+            penalty_filters += " AND fp.version_id = :version_id"
+
+        # Without a period/version filter several facts can match an indicator; keep the first
+        blocks_sql = RATING_BLOCKS_JSON_SQL.format(facts="facts", fact_match="fi.mo_id = m.mo_id")
+        penalties_sql = RATING_PENALTIES_JSON_SQL.format(penalty_match="fp.mo_id = m.mo_id" + penalty_filters)
+        rows = db.execute(text(f"""
+            WITH facts AS (
+                SELECT DISTINCT ON (mo_id, ind_id) mo_id, ind_id, score
+                FROM fact_indicator
+                WHERE mo_id = ANY(CAST(:mo_ids AS INTEGER[])) {fact_filters}
+                ORDER BY mo_id, ind_id, fact_ind_id
+            )
+            SELECT m.mo_id, ({blocks_sql}) AS blocks, ({penalties_sql}) AS penalties
+            FROM unnest(CAST(:mo_ids AS INTEGER[])) AS m(mo_id)
+        """), {"mo_ids": list(mo_ids), "period_id": period_id, "version_id": version_id})
+
+        return {mo_id: (blocks, penalties) for mo_id, blocks, penalties in rows}
     except Exception as e:
-        logger.warning(f"Error fetching penalties for MO {mo_id}: {str(e)}")
-        return []
+        logger.warning(f"Error fetching criteria blocks and penalties for MOs {mo_ids}: {str(e)}")
+        return {}
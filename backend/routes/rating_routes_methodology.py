@@ -8,14 +8,18 @@ Implements the official methodology for rating municipal heads:
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, text
+from sqlalchemy import Row, and_, func, text
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from collections import defaultdict
 import logging
+import orjson
 from pydantic import BaseModel
 
 from database import get_db
+from response_cache import cache_generation, cache_response, get_cached_response
 from models import DimMO, DimPeriod, DimIndicator, FactIndicator, FactPenalty
 
 router = APIRouter()
@@ -108,6 +112,66 @@ class ComprehensiveRating(BaseModel):
         from_attributes = True
 
 
+# ============================================================================
+# Reference Data
+# ============================================================================
+
+RISK_ZONES_REFERENCE = {
+    "zones": [
+        {
+            "zone_name": "Зелёная",
+            "score_range": "53-66",
+            "status": "High Stability",
+            "assessment": "Resignation unlikely, significant resources for management & career growth",
+            "color": "green"
+        },
+        {
+            "zone_name": "Жёлтая",
+            "score_range": "29-52",
+            "status": "Conditional Stability",
+            "assessment": "Risks exist, requires correction of management/political strategy",
+            "color": "yellow"
+        },
+        {
+            "zone_name": "Красная",
+            "score_range": "0-28",
+            "status": "Low Stability",
+            "assessment": "High risk of resignation in medium-term, serious systemic problems",
+            "color": "red"
+        }
+    ]
+}
+
+# Lower bound of each zone, highest first; anything below falls into the red zone
+_RISK_ZONE_THRESHOLDS = (
+    (53, ("Зелёная", "High Stability")),
+    (29, ("Жёлтая", "Conditional Stability")),
+)
+_LOWEST_RISK_ZONE = ("Красная", "Low Stability")
+
+# Methodology structure only changes with criteria edits
+METHODOLOGY_INFO_TTL = 3600
+
+# Score assembly and the info page only read these columns, so they are selected
+# as plain rows instead of hydrating ORM entities
+_MO_COLUMNS = (DimMO.mo_id, DimMO.mo_name, DimMO.leader_name)
+_PERIOD_COLUMNS = (DimPeriod.period_id, DimPeriod.date_from)
+_INDICATOR_COLUMNS = (
+    DimIndicator.code,
+    DimIndicator.name,
+    DimIndicator.block,
+    DimIndicator.rating_type,
+    DimIndicator.max_points,
+)
+_INFO_COLUMNS = (
+    DimIndicator.code,
+    DimIndicator.name,
+    DimIndicator.block,
+    DimIndicator.max_points,
+    DimIndicator.description,
+)
+
+
 # ============================================================================
 # Helper Functions
 # ============================================================================
@@ -117,12 +181,111 @@ def get_risk_zone(score: float) -> tuple[str, str]:
     Determine risk zone based on score.
     Returns (zone_name, status) tuple.
     """
-    if score >= 53:
-        return ("Зелёная", "High Stability")
-    elif score >= 29:
-        return ("Жёлтая", "Conditional Stability")
-    else:
-        return ("Красная", "Low Stability")
+    for threshold, zone in _RISK_ZONE_THRESHOLDS:
+        if score >= threshold:
+            return zone
+    return _LOWEST_RISK_ZONE
+
+
+def build_methodology_score(
+    mo: Row,
+    period: Row,
+    rating_type: str,
+    indicators: List[Row],
+    score_map: Dict[str, float],
+    penalties_value: float
+) -> MethodologyScore:
+    """
+    Assemble a MethodologyScore from already loaded data.
+
+    Args:
+        mo: Municipality row (_MO_COLUMNS)
+        period: Period row (_PERIOD_COLUMNS)
+        rating_type: 'ПУБЛИЧНЫЙ' or 'ЗАКРЫТЫЙ'
+        indicators: Non-penalty indicator rows of this rating type (_INDICATOR_COLUMNS)
+        score_map: Indicator code -> score for this municipality
+        penalties_value: Sum of penalty scores (negative)
+
+    All values come from typed DB columns or are computed here, so the models
+    are built with model_construct (no per-criterion validation).
+    """
+    # Build blocks and criteria
+    blocks_dict: Dict[str, Dict] = {}
+    total_max_points = 0
+    total_score = 0.0
+
+    criterion_scores = []
+
+    for indicator in indicators:
+        score = score_map.get(indicator.code, 0.0)
+        max_pts = indicator.max_points or 0
+
+        total_max_points += max_pts
+        total_score += score
+
+        # Create criterion score object
+        criterion = CriterionScore.model_construct(
+            code=indicator.code,
+            name=indicator.name,
+            block=indicator.block or "Unknown",
+            rating_type=indicator.rating_type,
+            is_penalty=False,
+            max_points=max_pts,
+            score=score,
+            percentage=(score / max_pts * 100) if max_pts > 0 else 0.0
+        )
+        criterion_scores.append(criterion)
+
+        # Add to blocks dict
+        block_name = indicator.block or "Unknown"
+        if block_name not in blocks_dict:
+            blocks_dict[block_name] = {
+                "max_points": 0,
+                "score": 0.0,
+                "criteria": [],
+                "rating_type": indicator.rating_type
+            }
+        blocks_dict[block_name]["max_points"] += max_pts
+        blocks_dict[block_name]["score"] += score
+        blocks_dict[block_name]["criteria"].append(criterion)
+
+    # Build blocks list
+    blocks = [
+        BlockScore.model_construct(
+            block_name=block_name,
+            rating_type=block_data["rating_type"],
+            max_points=block_data["max_points"],
+            score=block_data["score"],
+            percentage=(block_data["score"] / block_data["max_points"] * 100) if block_data["max_points"] > 0 else 0.0,
+            criteria_count=len(block_data["criteria"]),
+            criteria=block_data["criteria"]
+        )
+        for block_name, block_data in blocks_dict.items()
+    ]
+
+    # Calculate total with penalties
+    total_with_penalties = total_score + penalties_value
+
+    # Determine risk zone
+    zone_name, status = get_risk_zone(total_with_penalties)
+
+    # Build response
+    return MethodologyScore.model_construct(
+        mo_id=mo.mo_id,
+        mo_name=mo.mo_name,
+        leader_name=mo.leader_name,
+        rating_type=rating_type,
+        period_id=period.period_id,
+        period_date=period.date_from.isoformat() if period.date_from else "",
+        public_score=total_score if rating_type == "ПУБЛИЧНЫЙ" else None,
+        closed_score=total_score if rating_type == "ЗАКРЫТЫЙ" else None,
+        penalties=penalties_value,
+        subtotal=total_score,
+        total_score=total_with_penalties,
+        risk_zone=zone_name,
+        risk_status=status,
+        blocks=blocks
+    )
 
 
 def calculate_methodology_score(
@@ -143,19 +306,25 @@ def calculate_methodology_score(
     Returns:
         MethodologyScore object with complete breakdown, or None if data not found
     """
+    cache_key = ("methodology_score", mo_id, period_id, rating_type)
+    cached = get_cached_response(cache_key)
+    if cached is not None:
+        return cached
+    generation = cache_generation()
+
     try:
         # Get municipality
-        mo = db.query(DimMO).filter(DimMO.mo_id == mo_id).first()
+        mo = db.query(*_MO_COLUMNS).filter(DimMO.mo_id == mo_id).first()
         if not mo:
             return None
 
         # Get period
-        period = db.query(DimPeriod).filter(DimPeriod.period_id == period_id).first()
+        period = db.query(*_PERIOD_COLUMNS).filter(DimPeriod.period_id == period_id).first()
         if not period:
             return None
 
         # Get all indicators for this rating type
-        indicators = db.query(DimIndicator).filter(
+        indicators = db.query(*_INDICATOR_COLUMNS).filter(
             DimIndicator.rating_type == rating_type,
             DimIndicator.is_penalty == False
         ).all()
@@ -164,123 +333,171 @@ def calculate_methodology_score(
             logger.warning(f"No indicators found for rating_type={rating_type}")
             return None
 
-        # Get indicator codes
-        indicator_codes = [ind.code for ind in indicators]
-
-        # Get scores from fact_indicator
-        fact_scores = db.query(FactIndicator).filter(
+        # Get scores from fact_indicator (code joined in SQL, no lazy load per fact)
+        fact_scores = db.query(DimIndicator.code, FactIndicator.score).join(
+            DimIndicator, DimIndicator.ind_id == FactIndicator.ind_id
+        ).filter(
             FactIndicator.mo_id == mo_id,
             FactIndicator.period_id == period_id,
-            FactIndicator.ind_id.in_([ind.ind_id for ind in indicators])
-        ).all()
+            DimIndicator.rating_type == rating_type,
+            DimIndicator.is_penalty == False
+        ).order_by(FactIndicator.version_id).all()
 
-        # Create score mapping
-        score_map = {fs.indicator.code: fs.score for fs in fact_scores}
-
-        # Build blocks and criteria
-        blocks_dict: Dict[str, Dict] = {}
-        total_max_points = 0
-        total_score = 0.0
-
-        criterion_scores = []
-
-        for indicator in indicators:
-            score = score_map.get(indicator.code, 0.0)
-            max_pts = indicator.max_points or 0
-
-            total_max_points += max_pts
-            total_score += score
-
-            # Create criterion score object
-            criterion = CriterionScore(
-                code=indicator.code,
-                name=indicator.name,
-                block=indicator.block or "Unknown",
-                rating_type=indicator.rating_type,
-                is_penalty=False,
-                max_points=max_pts,
-                score=score,
-                percentage=(score / max_pts * 100) if max_pts > 0 else 0.0
-            )
-            criterion_scores.append(criterion)
-
-            # Add to blocks dict
-            block_name = indicator.block or "Unknown"
-            if block_name not in blocks_dict:
-                blocks_dict[block_name] = {
-                    "max_points": 0,
-                    "score": 0.0,
-                    "criteria": [],
-                    "rating_type": indicator.rating_type
-                }
-            blocks_dict[block_name]["max_points"] += max_pts
-            blocks_dict[block_name]["score"] += score
-            blocks_dict[block_name]["criteria"].append(criterion)
-
-        # Build blocks list
-        blocks = [
-            BlockScore(
-                block_name=block_name,
-                rating_type=block_data["rating_type"],
-                max_points=block_data["max_points"],
-                score=block_data["score"],
-                percentage=(block_data["score"] / block_data["max_points"] * 100) if block_data["max_points"] > 0 else 0.0,
-                criteria_count=len(block_data["criteria"]),
-                criteria=block_data["criteria"]
-            )
-            for block_name, block_data in blocks_dict.items()
-        ]
-
-        # Get penalties for this municipality
-        penalties_value = 0.0
-        penalty_indicators = db.query(DimIndicator).filter(
-            DimIndicator.is_penalty == True
-        ).all()
+        # Create score mapping (facts of several versions: the latest version wins)
+        score_map = {code: score for code, score in fact_scores}
 
-        penalty_facts = db.query(FactIndicator).filter(
+        # Get penalties for this municipality (scores are negative for penalties)
+        penalties_value = db.query(
+            func.coalesce(func.sum(FactIndicator.score), 0.0)
+        ).join(
+            DimIndicator, DimIndicator.ind_id == FactIndicator.ind_id
+        ).filter(
             FactIndicator.mo_id == mo_id,
             FactIndicator.period_id == period_id,
-            FactIndicator.ind_id.in_([ind.ind_id for ind in penalty_indicators])
-        ).all()
+            DimIndicator.is_penalty == True
+        ).scalar()
 
-        for fact in penalty_facts:
-            penalties_value += fact.score  # scores are negative for penalties
-
-        # Calculate total with penalties
-        total_with_penalties = total_score + penalties_value
-
-        # Determine risk zone
-        zone_name, status = get_risk_zone(total_with_penalties)
-
-        # Build response
-        return MethodologyScore(
-            mo_id=mo_id,
-            mo_name=mo.mo_name,
-            leader_name=mo.leader_name,
-            rating_type=rating_type,
-            period_id=period_id,
-            period_date=period.date_from.isoformat() if period.date_from else "",
-            public_score=total_score if rating_type == "ПУБЛИЧНЫЙ" else None,
-            closed_score=total_score if rating_type == "ЗАКРЫТЫЙ" else None,
-            penalties=penalties_value,
-            subtotal=total_score,
-            total_score=total_with_penalties,
-            risk_zone=zone_name,
-            risk_status=status,
-            blocks=blocks
-        )
+        score = build_methodology_score(mo, period, rating_type, indicators, score_map, penalties_value)
+        cache_response(cache_key, score, generation)
+        return score
 
     except Exception as e:
         logger.error(f"Error calculating methodology score: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
 
 
+def calculate_all_methodology_scores(
+    db: Session,
+    period_id: int,
+    rating_type: str,
+    sort: str = "score_total",
+    order: str = "desc"
+) -> List[MethodologyScore]:
+    """
+    Calculate official methodology scores for all municipalities in a period.
+
+    Same result as calling calculate_methodology_score for every DimMO, but
+    with a fixed number of queries: period, indicators, municipalities with
+    their score/penalty sums (ordered by Postgres) and all criteria facts
+    of the period.
+    """
+    cache_key = ("methodology_all", period_id, rating_type, sort, order)
+    cached = get_cached_response(cache_key)
+    if cached is not None:
+        return cached
+    generation = cache_generation()
+
+    period = db.query(*_PERIOD_COLUMNS).filter(DimPeriod.period_id == period_id).first()
+    if not period:
+        return []
+
+    indicators = db.query(*_INDICATOR_COLUMNS).filter(
+        DimIndicator.rating_type == rating_type,
+        DimIndicator.is_penalty == False
+    ).all()
+
+    if not indicators:
+        logger.warning(f"No indicators found for rating_type={rating_type}")
+        return []
+
+    # Per-MO criteria and penalty sums, so the ordering is done by Postgres
+    # One fact per (MO, criterion) from the latest version, the same row score_map keeps,
+    # so the sort key equals the displayed total_score
+    latest_facts = db.query(
+        FactIndicator.mo_id,
+        FactIndicator.score
+    ).join(
+        DimIndicator, DimIndicator.ind_id == FactIndicator.ind_id
+    ).filter(
+        FactIndicator.period_id == period_id,
+        DimIndicator.rating_type == rating_type,
+        DimIndicator.is_penalty == False
+    ).distinct(
+        FactIndicator.mo_id, FactIndicator.ind_id
+    ).order_by(
+        FactIndicator.mo_id, FactIndicator.ind_id, FactIndicator.version_id.desc()
+    ).subquery()
+
+    subtotals = db.query(
+        latest_facts.c.mo_id,
+        func.sum(latest_facts.c.score).label("subtotal")
+    ).group_by(latest_facts.c.mo_id).subquery()
+
+    penalty_sums = db.query(
+        FactIndicator.mo_id,
+        func.sum(FactIndicator.score).label("penalties")
+    ).join(
+        DimIndicator, DimIndicator.ind_id == FactIndicator.ind_id
+    ).filter(
+        FactIndicator.period_id == period_id,
+        DimIndicator.is_penalty == True
+    ).group_by(FactIndicator.mo_id).subquery()
+
+    penalties = func.coalesce(penalty_sums.c.penalties, 0.0)
+    sort_columns = {
+        "score_total": func.coalesce(subtotals.c.subtotal, 0.0) + penalties,
+        # COLLATE "C": code-point order, as the API has always sorted names
+        "mo_name": DimMO.mo_name.collate("C"),
+        "leader_name": func.coalesce(DimMO.leader_name, "").collate("C"),
+    }
+    order_by = [DimMO.mo_id]
+    if sort in sort_columns:
+        sort_col = sort_columns[sort]
+        order_by.insert(0, sort_col.desc() if order == "desc" else sort_col.asc())
+
+    municipalities = db.query(*_MO_COLUMNS, penalties.label("penalties")).outerjoin(
+        subtotals, subtotals.c.mo_id == DimMO.mo_id
+    ).outerjoin(
+        penalty_sums, penalty_sums.c.mo_id == DimMO.mo_id
+    ).order_by(*order_by).all()
+
+    fact_scores = db.query(FactIndicator.mo_id, DimIndicator.code, FactIndicator.score).join(
+        DimIndicator, DimIndicator.ind_id == FactIndicator.ind_id
+    ).filter(
+        FactIndicator.period_id == period_id,
+        DimIndicator.rating_type == rating_type,
+        DimIndicator.is_penalty == False
+    ).order_by(FactIndicator.version_id).all()
+
+    # Latest version wins, as in calculate_methodology_score
+    score_maps: Dict[int, Dict[str, float]] = defaultdict(dict)
+    for mo_id, code, score in fact_scores:
+        score_maps[mo_id][code] = score
+
+    scores = [
+        build_methodology_score(
+            mo, period, rating_type, indicators,
+            score_maps.get(mo.mo_id, {}), mo.penalties
+        )
+        for mo in municipalities
+    ]
+
+    # Прогреваем и кэш отдельных МО, которые запрашиваются со страницы детализации
+    cache_response(cache_key, scores, generation)
+    for score in scores:
+        cache_response(("methodology_score", score.mo_id, period_id, rating_type), score, generation)
+    return scores
+
+
+def _stream_scores(head: Dict[str, Any], scores: List[MethodologyScore]):
+    """
+    Encode {**head, "scores": [...]} with orjson one municipality at a time,
+    so the full payload never sits in memory twice (models + bytes).
+    """
+    yield orjson.dumps(head)[:-1] + b',"scores":['
+    for i, score in enumerate(scores):
+        yield (b"," if i else b"") + orjson.dumps(score.model_dump())
+    yield b"]}"
+
+
 # ============================================================================
 # API Endpoints
 # ============================================================================
+# Handlers that query the DB are plain `def`: FastAPI runs them in the
+# threadpool, so the sync Session doesn't block the event loop.
 
 @router.get("/methodology/score/{mo_id}")
-async def get_methodology_score(
+def get_methodology_score(
     mo_id: int,
     period_id: int = Query(..., description="Period ID"),
     rating_type: str = Query("ПУБЛИЧНЫЙ", description="ПУБЛИЧНЫЙ or ЗАКРЫТЫЙ"),
@@ -308,7 +525,7 @@ async def get_methodology_score(
 
 
 @router.get("/methodology/comprehensive/{mo_id}")
-async def get_comprehensive_rating(
+def get_comprehensive_rating(
     mo_id: int,
     period_id: int = Query(..., description="Period ID"),
     db: Session = Depends(get_db),
@@ -347,7 +564,7 @@ async def get_comprehensive_rating(
 
 
 @router.get("/methodology/all/{period_id}")
-async def get_all_methodology_scores(
+def get_all_methodology_scores(
     period_id: int,
     rating_type: str = Query("ПУБЛИЧНЫЙ", description="ПУБЛИЧНЫЙ or ЗАКРЫТЫЙ"),
     sort: str = Query("score_total", description="Field to sort by"),
@@ -370,29 +587,14 @@ async def get_all_methodology_scores(
         raise HTTPException(status_code=400, detail="rating_type must be 'ПУБЛИЧНЫЙ' or 'ЗАКРЫТЫЙ'")
 
     try:
-        # Get all municipalities
-        municipalities = db.query(DimMO).all()
-
-        scores = []
-        for mo in municipalities:
-            score = calculate_methodology_score(db, mo.mo_id, period_id, rating_type)
-            if score:
-                scores.append(score)
-
-        # Sort results
-        if sort == "score_total":
-            scores.sort(key=lambda x: x.total_score, reverse=(order == "desc"))
-        elif sort == "mo_name":
-            scores.sort(key=lambda x: x.mo_name, reverse=(order == "desc"))
-        elif sort == "leader_name":
-            scores.sort(key=lambda x: x.leader_name or "", reverse=(order == "desc"))
-
-        return {
+        scores = calculate_all_methodology_scores(db, period_id, rating_type, sort, order)
+
+        head = {
             "period_id": period_id,
             "rating_type": rating_type,
             "total_municipalities": len(scores),
-            "scores": scores
         }
+        return StreamingResponse(_stream_scores(head, scores), media_type="application/json")
 
     except Exception as e:
         logger.error(f"Error getting all methodology scores: {str(e)}")
@@ -407,51 +609,33 @@ async def get_risk_zones_reference():
     Returns:
     - List of RiskZone objects with definitions
     """
-    return {
-        "zones": [
-            {
-                "zone_name": "Зелёная",
-                "score_range": "53-66",
-                "status": "High Stability",
-                "assessment": "Resignation unlikely, significant resources for management & career growth",
-                "color": "green"
-            },
-            {
-                "zone_name": "Жёлтая",
-                "score_range": "29-52",
-                "status": "Conditional Stability",
-                "assessment": "Risks exist, requires correction of management/political strategy",
-                "color": "yellow"
-            },
-            {
-                "zone_name": "Красная",
-                "score_range": "0-28",
-                "status": "Low Stability",
-                "assessment": "High risk of resignation in medium-term, serious systemic problems",
-                "color": "red"
-            }
-        ]
-    }
+    return ORJSONResponse(RISK_ZONES_REFERENCE)
 
 
 @router.get("/methodology/info")
-async def get_methodology_info(db: Session = Depends(get_db)):
+def get_methodology_info(db: Session = Depends(get_db)):
     """
     Get comprehensive information about the official methodology structure.
 
     Returns:
     - Information about criteria, blocks, and point scales
     """
+    # Справочник меняется только при правке критериев (commit сбрасывает кэш)
+    cached = get_cached_response(("methodology_info",))
+    if cached is not None:
+        return ORJSONResponse(cached)
+    generation = cache_generation()
+
     # Get all official criteria grouped by rating type
-    public_criteria = db.query(DimIndicator).filter(
+    public_criteria = db.query(*_INFO_COLUMNS).filter(
         DimIndicator.rating_type == "ПУБЛИЧНЫЙ"
     ).all()
 
-    closed_criteria = db.query(DimIndicator).filter(
+    closed_criteria = db.query(*_INFO_COLUMNS).filter(
         DimIndicator.rating_type == "ЗАКРЫТЫЙ"
     ).all()
 
-    penalty_criteria = db.query(DimIndicator).filter(
+    penalty_criteria = db.query(*_INFO_COLUMNS).filter(
         DimIndicator.is_penalty == True
     ).all()
 
@@ -460,7 +644,7 @@ async def get_methodology_info(db: Session = Depends(get_db)):
     closed_max = sum(ind.max_points or 0 for ind in closed_criteria)
     penalty_max = sum(ind.max_points or 0 for ind in penalty_criteria)
 
-    return {
+    response = {
         "methodology": "Official Methodology for Rating Municipal Heads",
         "version": "2.0",
         "document_source": "Методика оценки эффективности деятельности глав администраций МО 23.10.pdf",
@@ -517,3 +701,5 @@ async def get_methodology_info(db: Session = Depends(get_db)):
             "red": {"range": "0-28", "status": "Low Stability"}
         }
     }
+    cache_response(("methodology_info",), response, generation, ttl=METHODOLOGY_INFO_TTL)
+    return ORJSONResponse(response)
@@ -0,0 +1,198 @@
+"""
+Unit tests for the import helpers and the cached-response ETag handling
+
+_write_facts is exercised on its non-PostgreSQL path (in-memory SQLite), which
+also covers the key dedup shared by every path; the PostgreSQL upsert/COPY
+branches need a live server.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from models import FactIndicator
+from response_cache import etag_response, render_json
+from routes.data_import_routes import (
+    _match_mo,
+    _normalize_mo_name,
+    _sheet_code_matcher,
+    _write_facts,
+)
+
+
+def _fact(mo_id, ind_id, score, period_id=1, version_id=1, **extra):
+    return {"mo_id": mo_id, "period_id": period_id, "ind_id": ind_id, "version_id": version_id,
+            "score": score, **extra}
+
+
+class TestWriteFacts:
+    """Test suite for _write_facts outside PostgreSQL"""
+
+    @pytest.fixture
+    def db_session(self):
+        """In-memory SQLite session with only the fact_indicator table"""
+        engine = create_engine("sqlite://")
+        FactIndicator.__table__.create(engine)
+        session = sessionmaker(bind=engine)()
+        yield session
+        session.close()
+        engine.dispose()
+
+    @staticmethod
+    def _rows(db_session):
+        return {
+            (f.mo_id, f.period_id, f.ind_id, f.version_id): (f.score, f.value_raw)
+            for f in db_session.query(FactIndicator)
+        }
+
+    def test_empty_is_noop(self, db_session):
+        """No facts: nothing written"""
+        _write_facts(db_session, [])
+        assert self._rows(db_session) == {}
+
+    def test_inserts_new_rows(self, db_session):
+        """Rows without an existing fact are inserted"""
+        _write_facts(db_session, [_fact(1, 1, 2.0), _fact(2, 1, 3.0), _fact(1, 2, 0.0, period_id=2)])
+        assert self._rows(db_session) == {
+            (1, 1, 1, 1): (2.0, None),
+            (2, 1, 1, 1): (3.0, None),
+            (1, 2, 2, 1): (0.0, None),
+        }
+
+    def test_duplicate_keys_last_row_wins(self, db_session):
+        """Several rows for one key collapse into one fact holding the last values"""
+        _write_facts(db_session, [
+            _fact(1, 1, 1.0, value_raw=10.0),
+            _fact(2, 1, 5.0, value_raw=50.0),
+            _fact(1, 1, 2.0, value_raw=20.0),
+        ])
+        assert self._rows(db_session) == {
+            (1, 1, 1, 1): (2.0, 20.0),
+            (2, 1, 1, 1): (5.0, 50.0),
+        }
+
+    def test_updates_existing_and_inserts_rest(self, db_session):
+        """Existing keys are updated in place, other keys inserted"""
+        _write_facts(db_session, [_fact(1, 1, 1.0), _fact(1, 1, 1.0, version_id=2)])
+        fact_id = db_session.query(FactIndicator.fact_ind_id).filter_by(version_id=1).scalar()
+
+        _write_facts(db_session, [_fact(1, 1, 3.0), _fact(3, 1, 4.0)])
+
+        assert self._rows(db_session) == {
+            (1, 1, 1, 1): (3.0, None),
+            (1, 1, 1, 2): (1.0, None),
+            (3, 1, 1, 1): (4.0, None),
+        }
+        # Update keeps the row (same id), no duplicate for the key
+        assert db_session.query(FactIndicator.fact_ind_id).filter_by(mo_id=1, version_id=1).all() == [(fact_id,)]
+
+    def test_only_written_columns_change(self, db_session):
+        """An update touches only the value columns present in the facts"""
+        _write_facts(db_session, [_fact(1, 1, 1.0, value_raw=7.0)])
+        _write_facts(db_session, [_fact(1, 1, 2.0)])
+        assert self._rows(db_session) == {(1, 1, 1, 1): (2.0, 7.0)}
+
+
+class TestMatchMo:
+    """Test suite for municipality name resolution"""
+
+    @pytest.fixture
+    def mo_lookup(self):
+        names = {1: "Липецк", 2: "Елецкий муниципальный район", 3: "г. Елец", 4: "Задонский район"}
+        return {
+            _normalize_mo_name(name): SimpleNamespace(mo_id=mo_id, mo_name=name)
+            for mo_id, name in names.items()
+        }
+
+    def test_exact_normalized(self, mo_lookup):
+        """Case, punctuation and extra spaces don't matter"""
+        assert _match_mo(mo_lookup, "  ЛИПЕЦК ").mo_id == 1
+        assert _match_mo(mo_lookup, "г Елец").mo_id == 3
+
+    def test_substring(self, mo_lookup):
+        """A name contained in a known name matches it"""
+        assert _match_mo(mo_lookup, "Задонский").mo_id == 4
+
+    def test_fuzzy_typo(self, mo_lookup):
+        """A small typo falls back to the closest name"""
+        assert _match_mo(mo_lookup, "Задонскй район").mo_id == 4
+
+    def test_unknown(self, mo_lookup):
+        """A different municipality is not matched"""
+        assert _match_mo(mo_lookup, "Грязинский район") is None
+
+    @pytest.mark.parametrize("placeholder", ["-", "—", "...", " ", ""])
+    def test_placeholder_not_matched(self, mo_lookup, placeholder):
+        """Cells holding only punctuation or spaces match no municipality"""
+        assert _match_mo(mo_lookup, placeholder) is None
+
+
+class TestSheetCodeMatcher:
+    """Test suite for sheet name -> criterion code matching"""
+
+    @pytest.fixture
+    def match(self):
+        return _sheet_code_matcher({
+            "Оценка поддержки руководства": "pub_1",
+            "Поддержка": "pub_x",
+            "Работа с ветеранами и участниками СВО": "pub_7",
+        })
+
+    def test_exact_case_insensitive(self, match):
+        assert match("ОЦЕНКА ПОДДЕРЖКИ РУКОВОДСТВА") == ("pub_1", "exact match")
+
+    def test_longest_contained_name(self, match):
+        """Sheet name containing criterion names: the longest one wins"""
+        assert match("Лист Оценка поддержки руководства v1") == (
+            "pub_1", "partial match: 'оценка поддержки руководства'"
+        )
+
+    def test_truncated_sheet_name(self, match):
+        """Excel truncates sheet names to 31 characters: the criterion containing it matches"""
+        assert match("Работа с ветеранами и участника") == (
+            "pub_7", "partial match: 'работа с ветеранами и участниками сво'"
+        )
+
+    def test_no_match(self, match):
+        assert match("Инвестиции") == (None, None)
+
+
+class TestEtagResponse:
+    """Test suite for conditional GET on cached JSON responses"""
+
+    @staticmethod
+    def _request(if_none_match=None):
+        headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+        return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": headers})
+
+    def test_render_json_etag_is_stable(self):
+        body, etag = render_json({"a": 1, "b": [1.5, None]})
+        assert body == b'{"a":1,"b":[1.5,null]}'
+        assert render_json({"a": 1, "b": [1.5, None]})[1] == etag
+        assert render_json({"a": 2})[1] != etag
+        assert etag.startswith('"') and etag.endswith('"')
+
+    def test_full_response_without_validator(self):
+        body, etag = render_json({"a": 1})
+        response = etag_response(self._request(), body, etag)
+        assert response.status_code == 200
+        assert response.body == body
+        assert response.headers["etag"] == etag
+        assert response.headers["cache-control"] == "private, max-age=30"
+
+    @pytest.mark.parametrize("header", ['{etag}', 'W/{etag}', '"other", {etag}', '*'])
+    def test_not_modified_on_match(self, header):
+        body, etag = render_json({"a": 1})
+        response = etag_response(self._request(header.format(etag=etag)), body, etag)
+        assert response.status_code == 304
+        assert response.body == b""
+        assert response.headers["etag"] == etag
+
+    def test_full_response_on_mismatch(self):
+        body, etag = render_json({"a": 1})
+        response = etag_response(self._request('"stale"'), body, etag)
+        assert response.status_code == 200
+        assert response.body == body
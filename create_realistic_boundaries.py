@@ -45,6 +45,8 @@ def create_circular_polygon(lat, lon, size, points=36):
         points: количество точек полигона
     """
     coordinates = []
+    # Поправка долготы не зависит от вершины - считаем один раз
+    cos_lat_corr = math.cos(lat * math.pi / 180)
 
     for i in range(points):
         angle = (i * 360 / points) * (math.pi / 180)
@@ -55,7 +57,7 @@ def create_circular_polygon(lat, lon, size, points=36):
         current_size = size * radius_variation
 
         point_lat = lat + current_size * math.sin(angle)
-        point_lon = lon + current_size * math.cos(angle) / math.cos(lat * math.pi / 180)
+        point_lon = lon + current_size * math.cos(angle) / cos_lat_corr
 
         coordinates.append([point_lon, point_lat])
 
@@ -80,21 +82,25 @@ def create_elliptical_polygon(lat, lon, size, points=36, eccentricity=1.5):
     """
     coordinates = []
 
+    # Эллиптическая форма с вариацией
+    a = size * eccentricity  # Большая полуось
+    b = size  # Малая полуось
+    # Поправка долготы не зависит от вершины - считаем один раз
+    cos_lat_corr = math.cos(lat * math.pi / 180)
+
     for i in range(points):
         angle = (i * 360 / points) * (math.pi / 180)
-
-        # Эллиптическая форма с вариацией
-        a = size * eccentricity  # Большая полуось
-        b = size  # Малая полуось
+        cos_a = math.cos(angle)
+        sin_a = math.sin(angle)
 
         # Добавляем волнистость границ
         wave = 1.0 + 0.15 * math.sin(5 * angle) + 0.1 * math.cos(7 * angle)
 
-        r = (a * b) / math.sqrt((b * math.cos(angle))**2 + (a * math.sin(angle))**2)
+        r = (a * b) / math.sqrt((b * cos_a)**2 + (a * sin_a)**2)
         r *= wave
 
-        point_lat = lat + r * math.sin(angle)
-        point_lon = lon + r * math.cos(angle) / math.cos(lat * math.pi / 180)
+        point_lat = lat + r * sin_a
+        point_lon = lon + r * cos_a / cos_lat_corr
 
         coordinates.append([point_lon, point_lat])
 
@@ -41,8 +41,7 @@ def create_municipalities(conn, df):
     municipalities = df[['Муниципалитет', 'Глава МО']].drop_duplicates()
 
     inserted = 0
-    for _, row in municipalities.iterrows():
-        mo_name = row['Муниципалитет']
+    for mo_name in municipalities['Муниципалитет']:
         if pd.isna(mo_name) or mo_name == '':
             continue
 
@@ -173,30 +172,29 @@ def load_indicator_values(conn, df, period_id, version_id):
     # Список служебных колонок
     skip_columns = ['Лист', 'Муниципалитет', 'Глава МО']
 
+    # Позиции колонок считаем один раз; строки читаем кортежами (без Series на каждую строку)
+    mo_pos = df.columns.get_loc('Муниципалитет')
+    value_columns = [
+        (pos, col_name, ind_map[col_name])
+        for pos, col_name in enumerate(df.columns)
+        if col_name not in skip_columns and col_name in ind_map
+    ]
+
     inserted = 0
     errors = 0
 
-    for _, row in df.iterrows():
-        mo_name = row['Муниципалитет']
+    for row in df.itertuples(index=False, name=None):
+        mo_name = row[mo_pos]
         if pd.isna(mo_name) or mo_name == '' or mo_name not in mo_map:
             continue
 
         mo_id = mo_map[mo_name]
 
-        for col_name in df.columns:
-            if col_name in skip_columns:
-                continue
-
-            value = row[col_name]
+        for pos, col_name, ind_id in value_columns:
+            value = row[pos]
             if pd.isna(value) or value == '':
                 continue
 
-            # Получаем ind_id
-            if col_name not in ind_map:
-                continue
-
-            ind_id = ind_map[col_name]
-
             # Пытаемся преобразовать значение в число
             try:
                 if isinstance(value, str):
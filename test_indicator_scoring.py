@@ -161,6 +161,46 @@ def test_pen_1():
         print(f"{status} ({tc['публичный']}, {tc['профильный']}): {score} (expected {expected})")
 
 
+def test_score_batch():
+    """score_batch must match score_indicator row by row, including rows that fail to score"""
+    print("\n=== Testing score_batch vs score_indicator ===")
+
+    meta = {"Муниципалитет": "Test", "Глава МО": "Test"}
+    cases = {
+        "pub_3": [
+            pd.Series({**meta, "Позиционирование": "Функционер"}),
+            pd.Series({**meta, "Позиционирование": "Размытое"}),
+            pd.Series({**meta, "Позиционирование": "что-то другое"}),  # rule returns None
+            pd.Series(meta),  # no data columns: None
+            None,  # not a row: the rule raises
+        ],
+        "pub_7": [
+            pd.Series({**meta, "Встречи": 40, "Участие": 0.85, "Решения": 0.75}),
+            pd.Series({**meta, "Встречи": 10, "Участие": 0.5, "Решения": 0.0}),
+            pd.Series(meta),
+            None,
+        ],
+        "pen_1": [
+            pd.Series({**meta, "Публичный конфликт": "Нет", "Профильный конфликт": "Да"}),
+            pd.Series({**meta, "Публичный конфликт": "Да", "Профильный конфликт": "Да"}),
+            None,
+        ],
+        "no_such_indicator": [pd.Series({**meta, "Значение": 1}), None],
+    }
+
+    for code, rows in cases.items():
+        expected = [IndicatorScorer.score_indicator(code, row) for row in rows]
+        scores = IndicatorScorer.score_batch(code, rows)
+        status = "✓" if scores.tolist() == expected else "✗"
+        print(f"{status} {code}: {scores.tolist()} (expected {expected})")
+        assert scores.tolist() == expected
+
+    # Any iterable of rows, result aligned with it
+    rows = cases["pub_7"]
+    assert len(IndicatorScorer.score_batch("pub_7", iter(rows))) == len(rows)
+    assert IndicatorScorer.score_batch("pub_7", []).tolist() == []
+
+
 def test_with_real_data():
     """Test with real CSV data"""
     print("\n=== Testing with Real CSV Data ===")
@@ -211,6 +251,7 @@ if __name__ == "__main__":
     test_pub_3()
     test_pub_7()
     test_pen_1()
+    test_score_batch()
 
     test_with_real_data()
 